@@ -11,12 +11,23 @@
 """
 
 import json
+import logging
 import os
+import threading
 import numpy as np
 import pandas as pd
+from collections import OrderedDict
 from datetime import datetime, timedelta, date, time
 from typing import Dict, Optional, Any
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
 
 class NumpyJSONEncoder(json.JSONEncoder):
     """自定义JSON编码器，处理numpy、pandas和datetime数据类型"""
@@ -117,6 +128,17 @@ class NumpyJSONEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+_JSON_ENCODER = NumpyJSONEncoder()
+
+# 内存中保留的已解析缓存条目数量上限
+ENTRY_MEMO_SIZE = 64
+
+
+def _shallow_copy(data):
+    """返回缓存数据的浅拷贝，避免调用方修改内存中的缓存条目"""
+    return dict(data) if isinstance(data, dict) else list(data) if isinstance(data, list) else data
+
+
 class MarketDataCache:
     """市场数据缓存管理器"""
     
@@ -124,9 +146,14 @@ class MarketDataCache:
         """初始化缓存管理器"""
         self.cache_dir = cache_dir
         project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        # 旧版所有数据共用的单个缓存文件，仅用于迁移
         self.cache_file = os.path.join(project_dir, cache_dir, "market_data.json")
-        
-        os.makedirs(cache_dir, exist_ok=True)
+        # 每个缓存键单独存为一个文件，写入时只改动对应条目，不再整体读写全部缓存
+        self.entry_dir = os.path.join(project_dir, cache_dir, "market_data")
+        os.makedirs(self.entry_dir, exist_ok=True)
+        # 已解析条目的内存LRU：cache_key -> (文件mtime_ns, entry)，文件未变化时直接复用，免去重复读盘和解析
+        self._entry_memo: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memo_lock = threading.Lock()
         
         # 缓存配置
         self.cache_configs = {
@@ -140,17 +167,113 @@ class MarketDataCache:
             'ai_analysis': {'expire_minutes': 180, 'description': 'AI大盘分析', 'index_specific': True},
             'technical_indicators': {'expire_minutes': 60, 'description': '技术指标数据', 'index_specific': True}
         }
+        
+        self._migrate_legacy_cache()
     
-    def load_cache(self) -> Dict:
-        """加载缓存文件"""
+    def _get_entry_path(self, cache_key: str) -> str:
+        """获取缓存条目对应的文件路径"""
+        return os.path.join(self.entry_dir, f"{cache_key}.json")
+    
+    def _read_json_file(self, path: str) -> Dict:
+        """读取JSON文件"""
+        if ORJSON_AVAILABLE:
+            # orjson写出的文件不含NaN/Infinity，无需再清理
+            with open(path, 'rb') as f:
+                return orjson.loads(f.read())
+        with open(path, 'r', encoding='utf-8') as f:
+            return self._clean_loaded_data(json.load(f))
+    
+    def _write_entry(self, cache_key: str, entry: Dict):
+        """写入单个缓存条目（先写临时文件再替换，避免读到写了一半的文件）"""
+        path = self._get_entry_path(cache_key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # 预清理数据，确保所有NaN和无穷大值都被处理
+        cleaned_entry = NumpyJSONEncoder.clean_data(entry)
+        if ORJSON_AVAILABLE:
+            # orjson原生处理numpy数组和datetime，其余类型交给NumpyJSONEncoder.default转换
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(cleaned_entry, default=_JSON_ENCODER.default,
+                                     option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cleaned_entry, f, ensure_ascii=False, indent=2, cls=NumpyJSONEncoder, allow_nan=False)
+        os.replace(tmp_path, path)
+        self._forget_entry(cache_key)
+    
+    def _forget_entry(self, cache_key: str):
+        """从内存LRU中移除条目"""
+        with self._memo_lock:
+            self._entry_memo.pop(cache_key, None)
+    
+    def _delete_entry(self, cache_key: str) -> bool:
+        """删除单个缓存条目，返回是否存在并已删除"""
+        self._forget_entry(cache_key)
+        try:
+            os.remove(self._get_entry_path(cache_key))
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def _migrate_legacy_cache(self):
+        """将旧版单文件缓存拆分为按键存储的文件"""
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                legacy_data = self._clean_loaded_data(json.load(f))
+            for cache_key, entry in legacy_data.items():
+                if not os.path.exists(self._get_entry_path(cache_key)):
+                    self._write_entry(cache_key, entry)
+            os.remove(self.cache_file)
+            print(f"📦 已将旧版市场数据缓存迁移为按键存储 ({len(legacy_data)}项)")
+        except Exception as e:
+            print(f"⚠️ 迁移旧版市场数据缓存失败: {e}")
+    
+    def list_cache_keys(self):
+        """列出所有缓存键"""
+        try:
+            return [name[:-5] for name in os.listdir(self.entry_dir) if name.endswith('.json')]
+        except OSError:
+            return []
+    
+    def load_entry(self, cache_key: str) -> Dict:
+        """读取单个缓存条目，不存在或读取失败时返回空字典
+        
+        文件未变化时返回内存中已解析的同一对象，调用方不应原地修改
+        """
+        path = self._get_entry_path(cache_key)
         try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return self._clean_loaded_data(data)
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            self._forget_entry(cache_key)
             return {}
+        
+        with self._memo_lock:
+            memo = self._entry_memo.get(cache_key)
+            if memo is not None and memo[0] == mtime_ns:
+                self._entry_memo.move_to_end(cache_key)
+                return memo[1]
+        
+        try:
+            entry = self._read_json_file(path)
         except Exception:
             return {}
+        
+        with self._memo_lock:
+            self._entry_memo[cache_key] = (mtime_ns, entry)
+            self._entry_memo.move_to_end(cache_key)
+            while len(self._entry_memo) > ENTRY_MEMO_SIZE:
+                self._entry_memo.popitem(last=False)
+        return entry
+    
+    def load_cache(self) -> Dict:
+        """加载全部缓存条目，返回 {缓存键: 条目}"""
+        cache_data = {}
+        for cache_key in self.list_cache_keys():
+            entry = self.load_entry(cache_key)
+            if entry:
+                cache_data[cache_key] = entry
+        return cache_data
     
     def _clean_loaded_data(self, data):
         """清理从JSON加载的数据，处理特殊值"""
@@ -165,18 +288,6 @@ class MarketDataCache:
         else:
             return data
     
-    def save_cache(self, cache_data: Dict):
-        """保存缓存文件"""
-        try:
-            # 预清理数据，确保所有NaN和无穷大值都被处理
-            cleaned_data = NumpyJSONEncoder.clean_data(cache_data)
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cleaned_data, f, ensure_ascii=False, indent=2, cls=NumpyJSONEncoder, allow_nan=False)
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            print(f"❌ 保存缓存失败: {e}")
-    
     def _get_cache_key(self, data_type: str, index_name: str = None) -> str:
         """生成缓存键名"""
         if data_type not in self.cache_configs:
@@ -189,15 +300,10 @@ class MarketDataCache:
         else:
             return data_type
     
-    def is_cache_valid(self, data_type: str, index_name: str = None) -> bool:
-        """检查缓存是否有效"""
+    def _is_entry_valid(self, data_type: str, entry: Dict) -> bool:
+        """检查已读取的缓存条目是否未过期"""
         try:
-            cache_key = self._get_cache_key(data_type, index_name)
-            cache_data = self.load_cache()
-            if cache_key not in cache_data:
-                return False
-            
-            cache_meta = cache_data[cache_key].get('cache_meta', {})
+            cache_meta = entry.get('cache_meta', {})
             cache_time = datetime.fromisoformat(cache_meta['timestamp'])
             expire_minutes = self.cache_configs[data_type]['expire_minutes']
             expire_time = cache_time + timedelta(minutes=expire_minutes)
@@ -206,20 +312,29 @@ class MarketDataCache:
         except Exception:
             return False
     
+    def is_cache_valid(self, data_type: str, index_name: str = None) -> bool:
+        """检查缓存是否有效"""
+        entry = self.load_entry(self._get_cache_key(data_type, index_name))
+        return bool(entry) and self._is_entry_valid(data_type, entry)
+    
+    def get_valid_cached_data(self, data_type: str, index_name: str = None) -> Optional[Dict]:
+        """缓存有效时返回数据（浅拷贝），无缓存或已过期返回None（只读取一次条目，代替is_cache_valid + get_cached_data）"""
+        entry = self.load_entry(self._get_cache_key(data_type, index_name))
+        if entry and self._is_entry_valid(data_type, entry):
+            return _shallow_copy(entry.get('data', {}))
+        return None
+    
     def get_cached_data(self, data_type: str, index_name: str = None) -> Dict:
-        """获取缓存数据"""
+        """获取缓存数据（返回浅拷贝，调用方增删字段不影响内存中的缓存条目）"""
         try:
-            cache_key = self._get_cache_key(data_type, index_name)
-            cache_data = self.load_cache()
-            return cache_data.get(cache_key, {}).get('data', {})
+            return _shallow_copy(self.load_entry(self._get_cache_key(data_type, index_name)).get('data', {}))
         except Exception:
             return {}
     
     def save_cached_data(self, data_type: str, data: Dict, index_name: str = None):
-        """保存数据到缓存"""
+        """保存数据到缓存（只写入该数据对应的条目文件）"""
         try:
             cache_key = self._get_cache_key(data_type, index_name)
-            cache_data = self.load_cache()
             
             cache_meta = {
                 'timestamp': datetime.now().isoformat(),
@@ -231,18 +346,17 @@ class MarketDataCache:
             if index_name and self.cache_configs[data_type].get('index_specific', False):
                 cache_meta['index_name'] = index_name
             
-            cache_data[cache_key] = {
+            self._write_entry(cache_key, {
                 'cache_meta': cache_meta,
                 'data': data
-            }
-            self.save_cache(cache_data)
+            })
             description = self.cache_configs.get(data_type, {}).get('description', data_type)
             if index_name and self.cache_configs[data_type].get('index_specific', False):
                 print(f"💾 {description}({index_name})已缓存")
             else:
                 print(f"💾 {description}已缓存")
         except Exception as e:
-            print(f"❌ 缓存数据失败: {e}")
+            logger.exception("❌ 缓存数据失败: %s", e)
     
     def clear_cache(self, data_type: Optional[str] = None, index_name: str = None):
         """清理缓存"""
@@ -252,41 +366,37 @@ class MarketDataCache:
                 return
             
             try:
-                cache_data = self.load_cache()
                 config = self.cache_configs[data_type]
                 
                 if config.get('index_specific', False) and index_name:
                     # 清理特定指数的缓存
-                    cache_key = self._get_cache_key(data_type, index_name)
-                    if cache_key in cache_data:
-                        del cache_data[cache_key]
+                    if self._delete_entry(self._get_cache_key(data_type, index_name)):
                         print(f"✅ 已清理{config['description']}({index_name})缓存")
                     else:
                         print(f"ℹ️ {config['description']}({index_name})缓存不存在")
                 elif config.get('index_specific', False):
                     # 清理该数据类型所有指数的缓存
-                    keys_to_delete = [k for k in cache_data.keys() if k.startswith(f"{data_type}_")]
+                    keys_to_delete = [k for k in self.list_cache_keys() if k.startswith(f"{data_type}_")]
                     for key in keys_to_delete:
-                        del cache_data[key]
+                        self._delete_entry(key)
                     if keys_to_delete:
                         print(f"✅ 已清理{len(keys_to_delete)}个{config['description']}缓存")
                     else:
                         print(f"ℹ️ 没有{config['description']}缓存需要清理")
                 else:
                     # 非指数相关数据，直接清理
-                    if data_type in cache_data:
-                        del cache_data[data_type]
+                    if self._delete_entry(data_type):
                         print(f"✅ 已清理{config['description']}缓存")
                     else:
                         print(f"ℹ️ {config['description']}缓存不存在")
-                
-                self.save_cache(cache_data)
             except Exception as e:
                 print(f"❌ 清理缓存失败: {e}")
         else:
             try:
-                if os.path.exists(self.cache_file):
-                    os.remove(self.cache_file)
+                cache_keys = self.list_cache_keys()
+                for key in cache_keys:
+                    self._delete_entry(key)
+                if cache_keys:
                     print("✅ 已清理所有缓存数据")
                 else:
                     print("ℹ️ 缓存文件不存在")
@@ -394,7 +504,7 @@ class MarketDataCache:
         
         print("=" * 80)
         print("📊 市场数据缓存状态")
-        print(f"📁 缓存文件: {self.cache_file}")
+        print(f"📁 缓存目录: {self.entry_dir}")
         print("=" * 80)
         
         for data_type, info in status.items():
@@ -416,10 +526,11 @@ class MarketDataCache:
                 print(f"{status_icon} {info['description']:<15} | {remaining:<15} | 过期时间: {info['expire_minutes']}分钟")
         
         try:
-            if os.path.exists(self.cache_file):
-                file_size = os.path.getsize(self.cache_file)
+            cache_keys = self.list_cache_keys()
+            if cache_keys:
+                file_size = sum(os.path.getsize(self._get_entry_path(key)) for key in cache_keys)
                 size_text = f"{file_size/1024:.1f}KB" if file_size > 1024 else f"{file_size}B"
-                print(f"\n📦 缓存文件大小: {size_text}")
+                print(f"\n📦 缓存文件大小: {size_text} ({len(cache_keys)}个条目)")
             else:
                 print(f"\n📦 缓存文件不存在")
         except Exception:
@@ -430,10 +541,13 @@ class MarketDataCache:
 
 # 全局缓存管理器实例
 _cache_manager = None
+_cache_manager_lock = threading.Lock()
 
 def get_cache_manager() -> MarketDataCache:
-    """获取全局缓存管理器实例"""
+    """获取全局缓存管理器实例（线程安全，保证所有调用方共用同一个内存LRU）"""
     global _cache_manager
     if _cache_manager is None:
-        _cache_manager = MarketDataCache()
+        with _cache_manager_lock:
+            if _cache_manager is None:
+                _cache_manager = MarketDataCache()
     return _cache_manager
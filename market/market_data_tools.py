@@ -2,6 +2,7 @@
 
 import os
 import sys
+import threading
 import warnings
 from datetime import datetime
 from typing import Dict, Optional
@@ -33,7 +34,6 @@ class MarketTools:
     def __init__(self, cache_dir: str = "data/cache"):
         """初始化市场工具"""
         self.cache_manager = get_cache_manager()
-        self.cache_file = self.cache_manager.cache_file
         self.cache_configs = self.cache_manager.cache_configs
     
     def get_market_sentiment(self, use_cache: bool = True, force_refresh: bool = False, comprehensive: bool = False) -> Dict:
@@ -46,9 +46,11 @@ class MarketTools:
         """
         data_type = 'comprehensive_sentiment' if comprehensive else 'market_sentiment'
         
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type):
-            print(f"📋 使用缓存的{self.cache_configs.get(data_type, {}).get('description', '市场情绪数据')}")
-            return self.cache_manager.get_cached_data(data_type)
+        if use_cache and not force_refresh:
+            cached_data = self.cache_manager.get_valid_cached_data(data_type)
+            if cached_data is not None:
+                print(f"📋 使用缓存的{self.cache_configs.get(data_type, {}).get('description', '市场情绪数据')}")
+                return cached_data
         
         print(f"📡 获取{'综合市场情绪分析' if comprehensive else '基础市场情绪'}...")
         try:
@@ -68,9 +70,11 @@ class MarketTools:
         """获取估值指标"""
         data_type = 'valuation_indicators'
         
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type):
-            print(f"📋 使用缓存的{self.cache_configs[data_type]['description']}")
-            return self.cache_manager.get_cached_data(data_type)
+        if use_cache and not force_refresh:
+            cached_data = self.cache_manager.get_valid_cached_data(data_type)
+            if cached_data is not None:
+                print(f"📋 使用缓存的{self.cache_configs[data_type]['description']}")
+                return cached_data
         
         print(f"📡 获取{self.cache_configs[data_type]['description']}...")
         try:
@@ -197,9 +201,11 @@ class MarketTools:
         """获取资金流向指标"""
         data_type = 'money_flow_indicators'
         
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type):
-            print(f"📋 使用缓存的{self.cache_configs[data_type]['description']}")
-            return self.cache_manager.get_cached_data(data_type)
+        if use_cache and not force_refresh:
+            cached_data = self.cache_manager.get_valid_cached_data(data_type)
+            if cached_data is not None:
+                print(f"📋 使用缓存的{self.cache_configs[data_type]['description']}")
+                return cached_data
         
         print(f"📡 获取{self.cache_configs[data_type]['description']}...")
         try:
@@ -215,9 +221,11 @@ class MarketTools:
         """获取融资融券数据"""
         data_type = 'margin_detail'
         
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type):
-            print(f"📋 使用缓存的{self.cache_configs[data_type]['description']}")
-            return self.cache_manager.get_cached_data(data_type)
+        if use_cache and not force_refresh:
+            cached_data = self.cache_manager.get_valid_cached_data(data_type)
+            if cached_data is not None:
+                print(f"📋 使用缓存的{self.cache_configs[data_type]['description']}")
+                return cached_data
         
         print(f"📡 获取{self.cache_configs[data_type]['description']}...")
         try:
@@ -233,9 +241,11 @@ class MarketTools:
         """获取当前指数实时数据"""
         data_type = 'current_indices'
         
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type):
-            print(f"📋 使用缓存的{self.cache_configs[data_type]['description']}")
-            return self.cache_manager.get_cached_data(data_type)
+        if use_cache and not force_refresh:
+            cached_data = self.cache_manager.get_valid_cached_data(data_type)
+            if cached_data is not None:
+                print(f"📋 使用缓存的{self.cache_configs[data_type]['description']}")
+                return cached_data
         
         print(f"📡 获取{self.cache_configs[data_type]['description']}...")
         try:
@@ -256,9 +266,11 @@ class MarketTools:
         
         data_type = 'market_news'
         
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type):
-            print(f"📋 使用缓存的市场新闻数据")
-            return self.cache_manager.get_cached_data(data_type)
+        if use_cache and not force_refresh:
+            cached_data = self.cache_manager.get_valid_cached_data(data_type)
+            if cached_data is not None:
+                print(f"📋 使用缓存的市场新闻数据")
+                return cached_data
         
         print(f"📡 获取市场新闻数据...")
         try:
@@ -284,9 +296,11 @@ class MarketTools:
         """获取指数技术指标，优先查缓存，没有再fetch"""
         data_type = f'technical_indicators'
         
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type, index_name):
-            print(f"📋 使用缓存的技术指标: {index_name}")
-            return self.cache_manager.get_cached_data(data_type, index_name)
+        if use_cache and not force_refresh:
+            cached_data = self.cache_manager.get_valid_cached_data(data_type, index_name)
+            if cached_data is not None:
+                print(f"📋 使用缓存的技术指标: {index_name}")
+                return cached_data
         
         print(f"📡 获取技术指标: {index_name}...")
         try:
@@ -381,9 +395,9 @@ class MarketTools:
         data_type = 'ai_analysis'
         
         # 检查缓存是否有效且不需要强制重新生成
-        if use_cache and self.cache_manager.is_cache_valid(data_type, index_name) and not force_regenerate:
-            # 获取缓存数据并检查user_opinion是否一致
-            cached_data = self.cache_manager.get_cached_data(data_type, index_name)
+        cached_data = self.cache_manager.get_valid_cached_data(data_type, index_name) if use_cache and not force_regenerate else None
+        if cached_data is not None:
+            # 检查user_opinion是否一致
             cached_user_opinion = cached_data.get('user_opinion', '')
             
             # 如果user_opinion与缓存中的一致，则使用缓存
@@ -495,12 +509,15 @@ class MarketTools:
 
 # 全局市场工具实例
 _market_tools = None
+_market_tools_lock = threading.Lock()
 
 def get_market_tools() -> MarketTools:
-    """获取全局市场工具实例"""
+    """获取全局市场工具实例（线程安全，多线程首次调用时也只创建一个实例）"""
     global _market_tools
     if _market_tools is None:
-        _market_tools = MarketTools()
+        with _market_tools_lock:
+            if _market_tools is None:
+                _market_tools = MarketTools()
     return _market_tools
 
 
@@ -4,8 +4,16 @@
 
 import json
 import os
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, Optional, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 
 class ChipDataCache:
@@ -19,6 +27,11 @@ class ChipDataCache:
         
         # 筹码数据缓存配置：24小时过期
         self.expire_hours = 24
+        # 所有股票共用一个缓存文件，读-改-写需要串行，避免并发生成报告时互相覆盖
+        self._write_lock = threading.Lock()
+        # 已解析的缓存文件 (mtime_ns, 内容)，文件未变化时直接复用，避免每次检查都重新解析整个文件
+        # 内容会被多个线程共享读取，只能整体替换，不能原地修改
+        self._loaded: Optional[tuple] = None
     
     def _make_json_safe(self, obj):
         """对象转为JSON安全格式"""
@@ -47,12 +60,28 @@ class ChipDataCache:
             return obj
     
     def load_cache(self) -> Dict:
-        """加载筹码缓存文件"""
+        """加载筹码缓存文件（文件mtime未变化时返回内存中已解析的内容）
+        
+        返回的字典在线程间共享，调用方不应原地修改，需要修改时先复制
+        """
         try:
-            if os.path.exists(self.cache_file):
+            try:
+                mtime_ns = os.stat(self.cache_file).st_mtime_ns
+            except FileNotFoundError:
+                return {}
+            
+            loaded = self._loaded
+            if loaded is not None and loaded[0] == mtime_ns:
+                return loaded[1]
+            
+            if ORJSON_AVAILABLE:
+                with open(self.cache_file, 'rb') as f:
+                    loaded_cache = orjson.loads(f.read())
+            else:
                 with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
+                    loaded_cache = json.load(f)
+            self._loaded = (mtime_ns, loaded_cache)
+            return loaded_cache
         except Exception as e:
             print(f"❌ 读取筹码缓存文件失败: {e}")
             return {}
@@ -61,9 +90,19 @@ class ChipDataCache:
         """保存筹码缓存文件"""
         try:
             safe_cache_data = self._make_json_safe(cache_data)
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(safe_cache_data, f, ensure_ascii=False, indent=2)
+            # 先写临时文件再替换，读取方不会读到写了一半的文件
+            tmp_file = f"{self.cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            if ORJSON_AVAILABLE:
+                with open(tmp_file, 'wb') as f:
+                    f.write(orjson.dumps(safe_cache_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            else:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(safe_cache_data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.cache_file)
+            # 写入的是新建的字典，直接作为内存中的内容，不必重新读取文件
+            self._loaded = (os.stat(self.cache_file).st_mtime_ns, safe_cache_data)
         except Exception as e:
+            self._loaded = None
             print(f"❌ 保存筹码缓存文件失败: {e}")
     
     def is_cache_valid(self, stock_code: str) -> bool:
@@ -73,7 +112,13 @@ class ChipDataCache:
             if stock_code not in cache_data:
                 return False
             
-            cache_time_str = cache_data[stock_code].get('cache_time')
+            cache_info = cache_data[stock_code]
+            expires_at = cache_info.get('expires_at')
+            if expires_at is not None:
+                return time.time() < expires_at
+            
+            # 兼容旧缓存：没有过期时间戳时解析ISO时间
+            cache_time_str = cache_info.get('cache_time')
             if not cache_time_str:
                 return False
             
@@ -84,7 +129,7 @@ class ChipDataCache:
         except Exception:
             return False
     
-    def get_cached_raw_data(self, stock_code: str) -> Optional[list]:
+    def get_cached_raw_data(self, stock_code: str) -> Optional[Union[Dict[str, list], list]]:
         """获取缓存的筹码原始数据"""
         try:
             if not self.is_cache_valid(stock_code):
@@ -95,21 +140,31 @@ class ChipDataCache:
         except Exception:
             return None
     
-    def save_raw_data(self, stock_code: str, raw_data: list):
-        """保存筹码原始数据到缓存"""
+    def save_raw_data(self, stock_code: str, raw_data: Union[Dict[str, list], list]):
+        """保存筹码原始数据到缓存
+        
+        推荐按列存储（{列名: 值列表}），每个列名只写一次，文件比逐行记录小得多，读取后可直接构建DataFrame
+        """
         try:
-            cache_data = self.load_cache()
-            
-            cache_data[stock_code] = {
-                'stock_code': stock_code,
-                'raw_data': raw_data,
-                'cache_time': datetime.now().isoformat(),
-                'data_count': len(raw_data) if raw_data else 0,
-                'expire_hours': self.expire_hours
-            }
+            if isinstance(raw_data, dict):
+                data_count = len(next(iter(raw_data.values()), []))
+            else:
+                data_count = len(raw_data) if raw_data else 0
             
-            self.save_cache(cache_data)
-            print(f"💾 {stock_code} 筹码原始数据已缓存 ({len(raw_data) if raw_data else 0}条记录)")
+            with self._write_lock:
+                # 复制后再修改，其他线程此时仍可能在读取内存中的缓存内容
+                cache_data = dict(self.load_cache())
+                now = datetime.now()
+                cache_data[stock_code] = {
+                    'stock_code': stock_code,
+                    'raw_data': raw_data,
+                    'cache_time': now.isoformat(),
+                    'expires_at': now.timestamp() + self.expire_hours * 3600,
+                    'data_count': data_count,
+                    'expire_hours': self.expire_hours
+                }
+                self.save_cache(cache_data)
+            print(f"💾 {stock_code} 筹码原始数据已缓存 ({data_count}条记录)")
         except Exception as e:
             print(f"❌ 缓存筹码原始数据失败: {e}")
     
@@ -118,10 +173,12 @@ class ChipDataCache:
         try:
             if stock_code:
                 # 清理特定股票的筹码缓存
-                cache_data = self.load_cache()
-                if stock_code in cache_data:
-                    del cache_data[stock_code]
-                    self.save_cache(cache_data)
+                with self._write_lock:
+                    cache_data = dict(self.load_cache())
+                    removed = cache_data.pop(stock_code, None) is not None
+                    if removed:
+                        self.save_cache(cache_data)
+                if removed:
                     print(f"✅ 已清理 {stock_code} 筹码缓存")
                 else:
                     print(f"ℹ️  {stock_code} 筹码缓存不存在")
@@ -205,10 +262,13 @@ class ChipDataCache:
 
 # 全局筹码缓存管理器实例
 _chip_cache_manager = None
+_chip_cache_manager_lock = threading.Lock()
 
 def get_chip_cache_manager() -> ChipDataCache:
-    """获取全局筹码缓存管理器实例"""
+    """获取全局筹码缓存管理器实例（线程安全）"""
     global _chip_cache_manager
     if _chip_cache_manager is None:
-        _chip_cache_manager = ChipDataCache()
+        with _chip_cache_manager_lock:
+            if _chip_cache_manager is None:
+                _chip_cache_manager = ChipDataCache()
     return _chip_cache_manager
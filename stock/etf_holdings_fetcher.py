@@ -3,9 +3,14 @@ ETF持仓数据获取器
 """
 import akshare as ak
 import pandas as pd
+from bisect import bisect_left
 from typing import Dict, List, Any
 from datetime import datetime
 
+# 前10大持仓占比的集中度分级边界及对应描述（左开右闭区间，超过边界才升一级）
+_CONCENTRATION_BOUNDS = (30, 50)
+_CONCENTRATION_LABELS = ("低", "中", "高")
+
 
 class ETFHoldingsFetcher:
     """ETF持仓数据获取器"""
@@ -127,11 +132,7 @@ class ETFHoldingsFetcher:
         top_20_weight = sum([h['占净值比例'] for h in holdings[:20]])
         
         # 集中度分析
-        concentration_level = "低"
-        if top_10_weight > 50:
-            concentration_level = "高"
-        elif top_10_weight > 30:
-            concentration_level = "中"
+        concentration_level = _CONCENTRATION_LABELS[bisect_left(_CONCENTRATION_BOUNDS, top_10_weight)]
         
         return {
             'top_5_weight': round(top_5_weight, 2),
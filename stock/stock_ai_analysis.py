@@ -4,9 +4,9 @@
 """
 
 from typing import Dict, Any, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from llm.openai_client import OpenAIClient
-import datetime
 import sys
 import os
 import traceback
@@ -17,6 +17,7 @@ if project_dir not in sys.path:
 
 from utils.string_utils import remove_markdown_format
 from utils.data_formatters import get_stock_formatter
+from utils.format_utils import now_str
 
 
 @dataclass
@@ -112,18 +113,21 @@ class DataCollector:
             'chip': '筹码分析'
         }
         
+        try:
+            cached_analyses = stock_tools.get_cached_ai_analyses(stock_code, list(analysis_types))
+        except Exception as e:
+            print(f"获取历史分析失败: {e}")
+            cached_analyses = {}
+        
         for analysis_type, description in analysis_types.items():
-            try:
-                cached_analysis = stock_tools.get_cached_ai_analysis(stock_code, analysis_type, use_cache=True)
-                if cached_analysis and 'report' in cached_analysis:
-                    historical_analyses[analysis_type] = cached_analysis['report']
-                    data_sources.append({
-                        'type': description,
-                        'description': f'缓存的{description}报告',
-                        'timestamp': cached_analysis.get('timestamp', '未知时间')
-                    })
-            except Exception as e:
-                print(f"获取{description}失败: {e}")
+            cached_analysis = cached_analyses.get(analysis_type)
+            if cached_analysis and 'report' in cached_analysis:
+                historical_analyses[analysis_type] = cached_analysis['report']
+                data_sources.append({
+                    'type': description,
+                    'description': f'缓存的{description}报告',
+                    'timestamp': cached_analysis.get('timestamp', '未知时间')
+                })
         
         return historical_analyses, data_sources
     
@@ -202,7 +206,7 @@ class DataCollector:
                 data_sources.append({
                     'type': '用户画像',
                     'description': '用户的投资偏好、风险承受能力等信息',
-                    'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    'timestamp': now_str()
                 })
             
             # 用户常犯错误
@@ -212,7 +216,7 @@ class DataCollector:
                 data_sources.append({
                     'type': '用户常犯错误',
                     'description': '用户在投资过程中常犯的错误和误区',
-                    'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    'timestamp': now_str()
                 })
         except Exception as e:
             print(f"获取用户配置失败: {e}")
@@ -276,7 +280,7 @@ class ReportFormatter:
             data_sources.append({
                 'type': '用户观点',
                 'description': '用户提供的投资观点和看法',
-                'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'timestamp': now_str()
             })
         
         if user_position and user_position.strip() and user_position.strip() != "不确定":
@@ -284,7 +288,7 @@ class ReportFormatter:
             data_sources.append({
                 'type': '用户持仓',
                 'description': f'用户当前持仓状态：{user_position.strip()}',
-                'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'timestamp': now_str()
             })
         
         return user_opinion_section, data_sources
@@ -310,7 +314,7 @@ class BaseAnalysisGenerator:
     def generate_analysis(self, analysis_type: str, messages: List[Dict], stock_code: str = "") -> AnalysisResult:
         """通用的分析生成方法"""
         config = self.config_manager.get_analysis_config(analysis_type)
-        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = now_str()
         
         if len(messages) > 1:
             _save_request_to_cache(messages[0]['content'] + "\n\n" + "@@@@@@@@" + "\n\n"  + messages[1]['content'], config['cache_filename'])
@@ -743,7 +747,11 @@ def generate_comprehensive_analysis_report(
     formatter = ReportFormatter()
     all_data_sources = []
     
+    market_executor = ThreadPoolExecutor(max_workers=1)
     try:
+        # 大盘数据与个股数据互不依赖且都需要网络请求，提前在后台线程收集，与下面的个股数据收集并行
+        market_future = market_executor.submit(collector.collect_market_data, market_tools, stock_identity)
+        
         # 1. 收集股票基本信息
         basic_info_section, basic_info_source = collector.collect_stock_basic_info(stock_identity)
         if basic_info_source:
@@ -758,11 +766,11 @@ def generate_comprehensive_analysis_report(
             all_data_sources.append({
                 'type': '提示信息',
                 'description': '未找到历史分析数据，将基于基本信息进行分析',
-                'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'timestamp': now_str()
             })
         
-        # 3. 收集大盘数据
-        market_report_text, market_ai_analysis, market_sources = collector.collect_market_data(market_tools, stock_identity)
+        # 3. 收集大盘数据（等待后台线程结果）
+        market_report_text, market_ai_analysis, market_sources = market_future.result()
         all_data_sources.extend(market_sources)
         
         # 4. 收集用户画像数据
@@ -853,7 +861,7 @@ def generate_comprehensive_analysis_report(
 
 **错误信息:** {str(e)}
 
-**时间:** {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+**时间:** {now_str()}
 
 ## 可能的解决方案：
 1. 检查网络连接
@@ -870,9 +878,11 @@ def generate_comprehensive_analysis_report(
         return AnalysisResult(
             success=False,
             report=error_report,
-            timestamp=datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            timestamp=now_str(),
             error_message=str(e),
             analysis_type="comprehensive",
             stock_code=stock_code,
             data_sources=all_data_sources
         )
+    finally:
+        market_executor.shutdown(wait=False)
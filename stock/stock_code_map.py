@@ -1,9 +1,16 @@
 import akshare as ak
 import os
 import json
+from functools import lru_cache
 from pathlib import Path
 import time
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 import sys
 if PROJECT_ROOT not in sys.path:
@@ -99,6 +106,24 @@ def _ensure_dir_exists(file_path):
     """确保文件目录存在"""
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
+def _read_map_file(file_path):
+    """读取映射表JSON文件，安装了orjson时使用orjson解析"""
+    if ORJSON_AVAILABLE:
+        with open(file_path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_map_file(file_path, data):
+    """写入映射表JSON文件，格式与标准库json输出一致（UTF-8、缩进2）"""
+    _ensure_dir_exists(file_path)
+    if ORJSON_AVAILABLE:
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
 def _load_stock_map(force_download=False):
     """加载股票代码和名称的映射关系"""
     global _STOCK_CODE_NAME_MAP, _STOCK_NAME_CODE_MAP, _LAST_UPDATE_TIME
@@ -107,17 +132,18 @@ def _load_stock_map(force_download=False):
     if _STOCK_CODE_NAME_MAP and (current_time - _LAST_UPDATE_TIME < 86400):  # 86400秒 = 24小时
         return
     
+    _clear_lookup_caches()
+    
     # 尝试从本地文件加载
     try:
         if os.path.exists(_MAP_FILE_PATH) and not force_download:
-            with open(_MAP_FILE_PATH, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                _STOCK_CODE_NAME_MAP = data.get('code_to_name', {})
-                _STOCK_NAME_CODE_MAP = data.get('name_to_code', {})
-                _LAST_UPDATE_TIME = data.get('update_time', 0)
-                
-                if current_time - _LAST_UPDATE_TIME < 604800:
-                    return
+            data = _read_map_file(_MAP_FILE_PATH)
+            _STOCK_CODE_NAME_MAP = data.get('code_to_name', {})
+            _STOCK_NAME_CODE_MAP = data.get('name_to_code', {})
+            _LAST_UPDATE_TIME = data.get('update_time', 0)
+            
+            if current_time - _LAST_UPDATE_TIME < 604800:
+                return
     except Exception as e:
         print(f"加载股票映射文件失败: {e}")
     
@@ -138,13 +164,11 @@ def _load_stock_map(force_download=False):
         _STOCK_NAME_CODE_MAP.update(_INDEX_NAME_CODE_MAP)
         
         # 保存到本地文件
-        _ensure_dir_exists(_MAP_FILE_PATH)
-        with open(_MAP_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump({
-                'code_to_name': _STOCK_CODE_NAME_MAP,
-                'name_to_code': _STOCK_NAME_CODE_MAP,
-                'update_time': current_time
-            }, f, ensure_ascii=False, indent=2)
+        _write_map_file(_MAP_FILE_PATH, {
+            'code_to_name': _STOCK_CODE_NAME_MAP,
+            'name_to_code': _STOCK_NAME_CODE_MAP,
+            'update_time': current_time
+        })
             
         _LAST_UPDATE_TIME = current_time
         print(f"股票映射表更新完成，共有 {len(_STOCK_CODE_NAME_MAP)} 个股票信息")
@@ -159,17 +183,18 @@ def _load_hk_stock_map(force_download=False):
     if _HK_STOCK_CODE_NAME_MAP and (current_time - _HK_LAST_UPDATE_TIME < 86400):
         return
     
+    _clear_lookup_caches()
+    
     # 尝试从本地文件加载
     try:
         if os.path.exists(_HK_MAP_FILE_PATH) and not force_download:
-            with open(_HK_MAP_FILE_PATH, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                _HK_STOCK_CODE_NAME_MAP = data.get('code_to_name', {})
-                _HK_STOCK_NAME_CODE_MAP = data.get('name_to_code', {})
-                _HK_LAST_UPDATE_TIME = data.get('update_time', 0)
-                
-                if current_time - _HK_LAST_UPDATE_TIME < 604800:
-                    return
+            data = _read_map_file(_HK_MAP_FILE_PATH)
+            _HK_STOCK_CODE_NAME_MAP = data.get('code_to_name', {})
+            _HK_STOCK_NAME_CODE_MAP = data.get('name_to_code', {})
+            _HK_LAST_UPDATE_TIME = data.get('update_time', 0)
+            
+            if current_time - _HK_LAST_UPDATE_TIME < 604800:
+                return
     except Exception as e:
         print(f"加载港股通映射文件失败: {e}")
     
@@ -185,19 +210,22 @@ def _load_hk_stock_map(force_download=False):
             _HK_STOCK_CODE_NAME_MAP[code] = name
             _HK_STOCK_NAME_CODE_MAP[name] = code
         
-        _ensure_dir_exists(_HK_MAP_FILE_PATH)
-        with open(_HK_MAP_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump({
-                'code_to_name': _HK_STOCK_CODE_NAME_MAP,
-                'name_to_code': _HK_STOCK_NAME_CODE_MAP,
-                'update_time': current_time
-            }, f, ensure_ascii=False, indent=2)
+        _write_map_file(_HK_MAP_FILE_PATH, {
+            'code_to_name': _HK_STOCK_CODE_NAME_MAP,
+            'name_to_code': _HK_STOCK_NAME_CODE_MAP,
+            'update_time': current_time
+        })
             
         _HK_LAST_UPDATE_TIME = current_time
         print(f"港股通映射表更新完成，共有 {len(_HK_STOCK_CODE_NAME_MAP)} 个港股通股票信息")
     except Exception as e:
         print(f"获取港股通映射关系失败: {e}")
 
+def _clear_lookup_caches():
+    """映射表重新加载或清除时，清空代码/名称查询结果的缓存"""
+    _lookup_stock_code.cache_clear()
+    _lookup_stock_name.cache_clear()
+
 def _find_fuzzy_match(target, mapping_dict):
     """模糊匹配辅助函数"""
     matched_items = [key for key in mapping_dict.keys() if target in key]
@@ -219,7 +247,11 @@ def get_stock_code(stock_name_or_code, market_type='A股'):
     
     _load_stock_map()
     _load_hk_stock_map()
-    
+    return _lookup_stock_code(stock_name_or_code)
+
+@lru_cache(maxsize=4096)
+def _lookup_stock_code(stock_name_or_code):
+    """在已加载的映射表中查找证券代码（名称需要模糊匹配时要遍历全表，结果缓存到映射表重新加载为止）"""
     if stock_name_or_code in _STOCK_CODE_NAME_MAP or stock_name_or_code in _HK_STOCK_CODE_NAME_MAP:
         return stock_name_or_code
     
@@ -245,7 +277,11 @@ def get_stock_name(stock_name_or_code, market_type='A股'):
     
     _load_stock_map()
     _load_hk_stock_map()
-    
+    return _lookup_stock_name(stock_name_or_code)
+
+@lru_cache(maxsize=4096)
+def _lookup_stock_name(stock_name_or_code):
+    """在已加载的映射表中查找证券名称，结果缓存到映射表重新加载为止"""
     if stock_name_or_code in _STOCK_NAME_CODE_MAP or stock_name_or_code in _HK_STOCK_NAME_CODE_MAP:
         return stock_name_or_code
     
@@ -266,6 +302,7 @@ def _clear_cache_files_and_vars(file_path, var_names):
         globals()[var_names[0]].clear()
         globals()[var_names[1]].clear()
         globals()[var_names[2]] = 0
+        _clear_lookup_caches()
         
     except Exception as e:
         print(f"清除缓存失败: {e}")
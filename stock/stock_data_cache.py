@@ -2,10 +2,102 @@
 股票数据缓存管理器
 """
 
+import base64
 import json
+import logging
+import mmap
 import os
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Any
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, time as dt_time, timedelta
+from typing import Dict, List, Optional, Any
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 缓存条目文件扩展名：安装了msgpack时使用二进制格式，编解码更快、文件更小，否则使用JSON
+ENTRY_EXT = '.msgpack' if MSGPACK_AVAILABLE else '.json'
+
+# 超过该大小的缓存文件通过mmap映射后直接解码，不再整文件读入bytes
+MMAP_THRESHOLD_BYTES = 64 * 1024
+
+# 比较条目内容是否变化时忽略的写入时间字段
+_VOLATILE_META_KEYS = frozenset(('timestamp', 'expires_at'))
+_VOLATILE_DATA_KEYS = frozenset(('update_time',))
+
+# 可直接写入JSON/msgpack的标量类型（按type精确匹配，numpy标量等子类仍走完整转换）
+_JSON_SCALAR_TYPES = frozenset((str, int, bool, type(None)))
+
+# 内存中保留的已解析缓存条目数量上限
+ENTRY_MEMO_SIZE = 256
+
+# 交易时段（覆盖A股和港股，节假日按交易日处理，只会让缓存更早过期）
+_TRADING_SESSIONS = ((dt_time(9, 15), dt_time(12, 0)), (dt_time(13, 0), dt_time(16, 10)))
+
+
+def _next_session_open(now: datetime) -> Optional[datetime]:
+    """处于交易时段内返回None，否则返回下一个交易时段的开始时间"""
+    if now.weekday() < 5:
+        current = now.time()
+        for start, end in _TRADING_SESSIONS:
+            if current < start:
+                return datetime.combine(now.date(), start)
+            if current <= end:
+                return None
+    # 当日收盘后或周末：下一个工作日的第一个交易时段
+    next_day = now.date() + timedelta(days=1)
+    while next_day.weekday() >= 5:
+        next_day += timedelta(days=1)
+    return datetime.combine(next_day, _TRADING_SESSIONS[0][0])
+
+# DataFrame以Arrow IPC字节流（base64编码）写入缓存时使用的标记键
+ARROW_FRAME_KEY = '__arrow_ipc__'
+
+
+def _pack_dataframe(df) -> Dict:
+    """将DataFrame编码为Arrow IPC流，保留列类型，避免逐行转换为字典"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return {ARROW_FRAME_KEY: base64.b64encode(sink.getvalue().to_pybytes()).decode('ascii')}
+
+
+def _decode_file(path: str, decode):
+    """读取文件并解码，大文件使用mmap，省去一次整文件拷贝"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD_BYTES:
+            return decode(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return decode(view)
+            finally:
+                view.release()
+
+
+def _unpack_dataframe(packed: Dict):
+    """从Arrow IPC流还原DataFrame"""
+    buf = base64.b64decode(packed[ARROW_FRAME_KEY])
+    return pa.ipc.open_stream(buf).read_all().to_pandas()
 
 
 class StockDataCache:
@@ -14,12 +106,17 @@ class StockDataCache:
     def __init__(self, cache_dir: str = "data/cache"):
         self.cache_dir = cache_dir
         project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.cache_file = os.path.join(project_dir, cache_dir, "stock_data.json")
-        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        # 每个缓存键单独存为一个文件，写入时只改动对应条目，不再整体读写全部缓存
+        self.entry_dir = os.path.join(project_dir, cache_dir, "stock_data")
+        os.makedirs(self.entry_dir, exist_ok=True)
+        # 已解析条目的内存LRU：cache_key -> (文件mtime_ns, entry)，文件未变化时直接复用，免去重复读盘和解析
+        self._entry_memo: OrderedDict = OrderedDict()
+        self._memo_lock = threading.Lock()
         self.cache_configs = {
-            'basic_info': {'expire_minutes': 5, 'description': '股票基本信息'},
+            # off_session_expire_minutes：非交易时段写入时使用的过期时间，行情不变，最多缓存到下一个交易时段开始
+            'basic_info': {'expire_minutes': 5, 'off_session_expire_minutes': 24 * 60, 'description': '股票基本信息'},
             'technical_indicators': {'expire_minutes': 30, 'description': '技术指标和风险指标'},
-            'news_data': {'expire_minutes': 60, 'description': '新闻资讯数据'},
+            'news_data': {'expire_minutes': 60, 'off_session_expire_minutes': 180, 'description': '新闻资讯数据'},
             'chip_data': {'expire_minutes': 1440, 'description': '筹码分析数据'},
             
             # 细分AI分析类型，不同类型设置不同的过期时间
@@ -33,6 +130,8 @@ class StockDataCache:
             # 保持向后兼容
             'ai_analysis': {'expire_minutes': 180, 'description': 'AI分析报告（通用）'},
         }
+        self._migrate_legacy_cache(os.path.join(project_dir, cache_dir, "stock_data.json"))
+        self._migrate_json_entries()
     
     def _get_expire_minutes(self, data_type: str, cache_meta: Dict = None) -> int:
         """动态获取过期时间配置"""
@@ -47,6 +146,17 @@ class StockDataCache:
         # 使用通用配置
         return self.cache_configs.get(data_type, {}).get('expire_minutes', 180)
     
+    def _get_write_expire_minutes(self, data_type: str, analysis_type: Optional[str], now: datetime) -> int:
+        """写入缓存时使用的过期时间：非交易时段按数据更新节奏延长，但不超过下一个交易时段开始"""
+        expire_minutes = self._get_expire_minutes(data_type, {'analysis_type': analysis_type})
+        off_session_minutes = self.cache_configs.get(data_type, {}).get('off_session_expire_minutes')
+        if off_session_minutes:
+            next_open = _next_session_open(now)
+            if next_open is not None:
+                minutes_to_open = int((next_open - now).total_seconds() // 60)
+                expire_minutes = max(expire_minutes, min(off_session_minutes, minutes_to_open))
+        return expire_minutes
+    
     def _get_cache_description(self, data_type: str, analysis_type: str = None) -> str:
         """获取缓存描述信息"""
         # 对于AI分析类型，优先使用具体的配置
@@ -58,8 +168,30 @@ class StockDataCache:
         # 使用通用配置
         return self.cache_configs.get(data_type, {}).get('description', data_type)
 
+    def is_meta_valid(self, data_type: str, cache_meta: Dict) -> bool:
+        """根据缓存元数据判断是否过期，优先使用写入时记录的过期时间戳"""
+        expires_at = cache_meta.get('expires_at')
+        if expires_at is not None:
+            return time.time() < expires_at
+        
+        # 兼容旧缓存：没有过期时间戳时由写入时间计算（不修改传入的元数据，它可能是内存LRU中共享的对象）
+        cache_time = datetime.fromisoformat(cache_meta['timestamp'])
+        expire_minutes = self._get_expire_minutes(data_type, cache_meta)
+        return time.time() < (cache_time + timedelta(minutes=expire_minutes)).timestamp()
+
     def _make_json_safe(self, obj):
         """对象转为JSON安全格式"""
+        # 缓存内容绝大多数是字符串和普通数值（AI报告、新闻），先按类型快速返回，不逐个做pandas类型判断
+        obj_type = type(obj)
+        if obj_type in _JSON_SCALAR_TYPES:
+            return obj
+        if obj_type is float:
+            return None if obj != obj else obj
+        if obj_type is dict:
+            return {key: self._make_json_safe(value) for key, value in obj.items()}
+        if obj_type is list:
+            return [self._make_json_safe(item) for item in obj]
+        
         import numpy as np
         import pandas as pd
         
@@ -70,6 +202,11 @@ class StockDataCache:
         elif isinstance(obj, pd.Series):
             return obj.tolist()
         elif isinstance(obj, pd.DataFrame):
+            if PYARROW_AVAILABLE:
+                try:
+                    return _pack_dataframe(obj)
+                except Exception:
+                    pass
             return obj.to_dict('records')
         elif isinstance(obj, (np.integer, np.int64, np.int32)):
             return int(obj)
@@ -84,24 +221,192 @@ class StockDataCache:
         else:
             return obj
     
-    def load_cache(self) -> Dict:
-        """加载缓存文件"""
+    def _restore_dataframes(self, obj):
+        """还原缓存数据中以Arrow格式保存的DataFrame（只遍历嵌套字典，不展开新闻等列表数据）
+        
+        无法解码时（如未安装pyarrow）抛出ValueError，由调用方按缓存未命中处理，不返回残缺数据
+        """
+        if isinstance(obj, dict):
+            if ARROW_FRAME_KEY in obj and len(obj) == 1:
+                if not PYARROW_AVAILABLE:
+                    raise ValueError("缓存中的DataFrame为Arrow格式，但未安装pyarrow")
+                try:
+                    return _unpack_dataframe(obj)
+                except Exception as e:
+                    raise ValueError(f"Arrow格式DataFrame解码失败: {e}") from e
+            return {key: self._restore_dataframes(value) for key, value in obj.items()}
+        return obj
+    
+    def _get_entry_path(self, cache_key: str) -> str:
+        """获取缓存条目对应的文件路径"""
+        return os.path.join(self.entry_dir, f"{cache_key}{ENTRY_EXT}")
+    
+    def _read_entry_file(self, path: str) -> Dict:
+        """读取单个缓存条目文件"""
+        if MSGPACK_AVAILABLE:
+            return _decode_file(path, lambda buf: msgpack.unpackb(buf, raw=False, strict_map_key=False))
+        return self._read_json_file(path)
+    
+    def _read_json_file(self, path: str) -> Dict:
+        """读取JSON格式的缓存条目文件"""
+        if ORJSON_AVAILABLE:
+            return _decode_file(path, orjson.loads)
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _write_entry_file(self, path: str, safe_entry: Dict):
+        """写入单个已转为JSON安全格式的缓存条目文件（先写临时文件再替换，避免读到写了一半的文件）"""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if MSGPACK_AVAILABLE:
+            with open(tmp_path, 'wb') as f:
+                f.write(msgpack.packb(safe_entry, use_bin_type=True))
+        elif ORJSON_AVAILABLE:
+            # orjson直接输出UTF-8字节，比标准库json快数倍
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(safe_entry, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(safe_entry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    
+    def _migrate_legacy_cache(self, legacy_file: str):
+        """将旧版单文件缓存拆分为按键存储的文件"""
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                legacy_data = json.load(f)
+            for cache_key, entry in legacy_data.items():
+                path = self._get_entry_path(cache_key)
+                if not os.path.exists(path):
+                    self._write_entry_file(path, entry)
+            os.remove(legacy_file)
+            logger.info("📦 已将旧版股票数据缓存迁移为按键存储 (%d项)", len(legacy_data))
+        except Exception as e:
+            logger.warning("⚠️ 迁移旧版股票数据缓存失败: %s", e)
+    
+    def _migrate_json_entries(self):
+        """安装msgpack后，将已有的JSON格式缓存条目转换为msgpack格式"""
+        if not MSGPACK_AVAILABLE:
+            return
         try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            json_names = [name for name in os.listdir(self.entry_dir) if name.endswith('.json')]
+        except OSError:
+            return
+        
+        for name in json_names:
+            json_path = os.path.join(self.entry_dir, name)
+            try:
+                self._write_entry_file(self._get_entry_path(name[:-5]), self._read_json_file(json_path))
+                os.remove(json_path)
+            except Exception as e:
+                logger.warning("⚠️ 转换缓存条目 %s 失败: %s", name, e)
+        if json_names:
+            logger.info("📦 已将 %d 项JSON缓存条目转换为msgpack格式", len(json_names))
+    
+    def list_cache_keys(self) -> List[str]:
+        """列出所有缓存键"""
+        try:
+            return [name[:-len(ENTRY_EXT)] for name in os.listdir(self.entry_dir) if name.endswith(ENTRY_EXT)]
+        except Exception:
+            return []
+    
+    def load_entry(self, cache_key: str) -> Dict:
+        """读取单个缓存条目（包含cache_meta和data），不存在时返回空字典
+        
+        文件未变化时返回内存中已解析的同一对象，调用方不应原地修改
+        """
+        path = self._get_entry_path(cache_key)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            self._forget_entry(cache_key)
             return {}
+        
+        with self._memo_lock:
+            memo = self._entry_memo.get(cache_key)
+            if memo is not None and memo[0] == mtime_ns:
+                self._entry_memo.move_to_end(cache_key)
+                return memo[1]
+        
+        try:
+            entry = self._read_entry_file(path)
         except Exception:
             return {}
+        
+        with self._memo_lock:
+            self._entry_memo[cache_key] = (mtime_ns, entry)
+            self._entry_memo.move_to_end(cache_key)
+            while len(self._entry_memo) > ENTRY_MEMO_SIZE:
+                self._entry_memo.popitem(last=False)
+        return entry
+    
+    def _forget_entry(self, cache_key: str):
+        """从内存LRU中移除条目"""
+        with self._memo_lock:
+            self._entry_memo.pop(cache_key, None)
     
-    def save_cache(self, cache_data: Dict):
-        """保存缓存文件"""
+    def put_entry(self, cache_key: str, entry: Dict, check_unchanged: bool = True):
+        """写入单个缓存条目，只改写该条目对应的文件
+        
+        check_unchanged为True时先与现有条目比较，内容未变化则跳过写入
+        """
         try:
-            safe_cache_data = self._make_json_safe(cache_data)
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(safe_cache_data, f, ensure_ascii=False, indent=2)
+            safe_entry = self._make_json_safe(entry)
+            if check_unchanged and self._is_unchanged(cache_key, safe_entry):
+                logger.debug("⏭️ %s 缓存内容未变化，跳过写入", cache_key)
+                return
+            self._write_entry_file(self._get_entry_path(cache_key), safe_entry)
         except Exception as e:
-            print(f"❌ 保存股票数据缓存失败: {e}")
+            logger.error("❌ 保存股票数据缓存失败: %s", e)
+        finally:
+            self._forget_entry(cache_key)
+    
+    def upsert(self, cache_key: str, entry: Dict):
+        """写入或覆盖单个条目，不读取旧条目（用于确定是新内容的写入，如新生成的AI报告）"""
+        self.put_entry(cache_key, entry, check_unchanged=False)
+    
+    def _is_unchanged(self, cache_key: str, safe_entry: Dict) -> bool:
+        """新条目除写入时间外与当前仍有效的缓存条目完全一致时返回True
+        
+        仅在旧条目未过期时跳过写入，否则必须写入以刷新过期时间
+        """
+        existing = self.load_entry(cache_key)
+        if not existing:
+            return False
+        
+        old_meta, new_meta = existing.get('cache_meta', {}), safe_entry.get('cache_meta', {})
+        if any(old_meta.get(key) != value for key, value in new_meta.items() if key not in _VOLATILE_META_KEYS):
+            return False
+        
+        old_data, new_data = existing.get('data'), safe_entry.get('data')
+        if isinstance(old_data, dict) and isinstance(new_data, dict):
+            if old_data.keys() - _VOLATILE_DATA_KEYS != new_data.keys() - _VOLATILE_DATA_KEYS:
+                return False
+            if any(old_data[key] != value for key, value in new_data.items() if key not in _VOLATILE_DATA_KEYS):
+                return False
+        elif old_data != new_data:
+            return False
+        
+        return self.is_meta_valid(new_meta.get('data_type', ''), old_meta)
+    
+    def delete_entry(self, cache_key: str) -> bool:
+        """删除单个缓存条目，返回是否存在并已删除"""
+        self._forget_entry(cache_key)
+        path = self._get_entry_path(cache_key)
+        if os.path.exists(path):
+            os.remove(path)
+            return True
+        return False
+    
+    def load_cache(self) -> Dict:
+        """加载全部缓存条目（仅用于状态统计，单条读写请使用load_entry/put_entry）"""
+        cache_data = {}
+        for cache_key in self.list_cache_keys():
+            entry = self.load_entry(cache_key)
+            if entry:
+                cache_data[cache_key] = entry
+        return cache_data
     
     def get_cache_key(self, data_type: str, stock_code: str, analysis_type: str = None) -> str:
         """生成缓存键"""
@@ -112,55 +417,57 @@ class StockDataCache:
     def is_cache_valid(self, data_type: str, stock_code: str, analysis_type: str = None) -> bool:
         """检查缓存是否有效"""
         try:
-            cache_data = self.load_cache()
-            cache_key = self.get_cache_key(data_type, stock_code, analysis_type)
-            if cache_key not in cache_data:
+            entry = self.load_entry(self.get_cache_key(data_type, stock_code, analysis_type))
+            if not entry:
                 return False
-            cache_meta = cache_data[cache_key].get('cache_meta', {})
-            cache_time = datetime.fromisoformat(cache_meta['timestamp'])
-            
-            # 动态获取过期时间配置
-            expire_minutes = self._get_expire_minutes(data_type, cache_meta)
-            expire_time = cache_time + timedelta(minutes=expire_minutes)
-            return datetime.now() < expire_time
+            return self.is_meta_valid(data_type, entry.get('cache_meta', {}))
         except Exception:
             return False
     
     def get_cached_data(self, data_type: str, stock_code: str, analysis_type: str = None) -> Dict:
         """获取缓存数据"""
         try:
-            cache_data = self.load_cache()
-            cache_key = self.get_cache_key(data_type, stock_code, analysis_type)
-            return cache_data.get(cache_key, {}).get('data', {})
+            entry = self.load_entry(self.get_cache_key(data_type, stock_code, analysis_type))
+            return self._restore_dataframes(entry.get('data', {}))
         except Exception:
             return {}
     
-    def save_cached_data(self, data_type: str, stock_code: str, data: Dict, analysis_type: str = None):
-        """保存数据到缓存"""
+    def get_valid_cached_data(self, data_type: str, stock_code: str, analysis_type: str = None) -> Optional[Dict]:
+        """缓存有效时返回数据，无缓存或已过期返回None（只读取一次条目，代替is_cache_valid + get_cached_data）"""
+        try:
+            entry = self.load_entry(self.get_cache_key(data_type, stock_code, analysis_type))
+            if entry and self.is_meta_valid(data_type, entry.get('cache_meta', {})):
+                return self._restore_dataframes(entry.get('data', {}))
+        except Exception:
+            pass
+        return None
+    
+    def save_cached_data(self, data_type: str, stock_code: str, data: Dict, analysis_type: str = None,
+                         check_unchanged: bool = True):
+        """保存数据到缓存，check_unchanged为False时不读取旧条目直接覆盖"""
         try:
-            cache_data = self.load_cache()
             cache_key = self.get_cache_key(data_type, stock_code, analysis_type)
             
             # 动态获取过期时间配置
-            expire_minutes = self._get_expire_minutes(data_type, {'analysis_type': analysis_type})
+            now = datetime.now()
+            expire_minutes = self._get_write_expire_minutes(data_type, analysis_type, now)
             
-            cache_data[cache_key] = {
+            self.put_entry(cache_key, {
                 'cache_meta': {
-                    'timestamp': datetime.now().isoformat(),
+                    'timestamp': now.isoformat(),
+                    'expires_at': now.timestamp() + expire_minutes * 60,
                     'data_type': data_type,
                     'stock_code': stock_code,
                     'analysis_type': analysis_type,
                     'expire_minutes': expire_minutes
                 },
                 'data': data
-            }
-            self.save_cache(cache_data)
+            }, check_unchanged=check_unchanged)
             
-            # 获取描述信息
-            description = self._get_cache_description(data_type, analysis_type)
-            print(f"💾 {stock_code} {description}已缓存")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("💾 %s %s已缓存", stock_code, self._get_cache_description(data_type, analysis_type))
         except Exception as e:
-            print(f"❌ 缓存股票数据失败: {e}")
+            logger.error("❌ 缓存股票数据失败: %s", e)
     
     def get_ai_analysis_cache(self, stock_code: str, analysis_type: str, use_cache: bool = True) -> Dict:
         """获取AI分析缓存的便捷方法"""
@@ -169,8 +476,8 @@ class StockDataCache:
         return self.get_cached_data('ai_analysis', stock_code, analysis_type)
     
     def set_ai_analysis_cache(self, stock_code: str, analysis_type: str, data: Dict):
-        """设置AI分析缓存的便捷方法"""
-        self.save_cached_data('ai_analysis', stock_code, data, analysis_type)
+        """设置AI分析缓存的便捷方法（新生成的分析内容必然不同，直接覆盖写入，无需先读取旧条目）"""
+        self.save_cached_data('ai_analysis', stock_code, data, analysis_type, check_unchanged=False)
     
     def is_ai_analysis_cache_valid(self, stock_code: str, analysis_type: str) -> bool:
         """检查AI分析缓存是否有效的便捷方法"""
@@ -179,54 +486,42 @@ class StockDataCache:
     def clear_cache(self, stock_code: Optional[str] = None, data_type: Optional[str] = None):
         """清理缓存"""
         try:
-            cache_data = self.load_cache()
-            cache_cleared = False
+            cache_keys = self.list_cache_keys()
             
             if stock_code and data_type:
                 # 清理特定股票的特定数据类型
-                cache_key = self.get_cache_key(data_type, stock_code)
-                if cache_key in cache_data:
-                    del cache_data[cache_key]
-                    self.save_cache(cache_data)
-                    cache_cleared = True
+                if self.delete_entry(self.get_cache_key(data_type, stock_code)):
                     print(f"✅ 已清理 {stock_code} {self.cache_configs.get(data_type, {}).get('description', data_type)} 缓存")
                 else:
                     print(f"ℹ️  {stock_code} {data_type} 缓存不存在")
                     
             elif stock_code:
                 # 清理特定股票的所有缓存
-                keys_to_remove = [key for key in cache_data.keys() if key.endswith(f"_{stock_code}")]
+                keys_to_remove = [key for key in cache_keys if key.endswith(f"_{stock_code}")]
                 for key in keys_to_remove:
-                    del cache_data[key]
+                    self.delete_entry(key)
                 if keys_to_remove:
-                    self.save_cache(cache_data)
-                    cache_cleared = True
                     print(f"✅ 已清理 {stock_code} 所有缓存 ({len(keys_to_remove)}项)")
                 else:
                     print(f"ℹ️  {stock_code} 无缓存数据")
                     
             elif data_type:
                 # 清理特定数据类型的所有缓存
-                keys_to_remove = [key for key in cache_data.keys() if key.startswith(f"{data_type}_")]
+                keys_to_remove = [key for key in cache_keys if key.startswith(f"{data_type}_")]
                 for key in keys_to_remove:
-                    del cache_data[key]
+                    self.delete_entry(key)
                 if keys_to_remove:
-                    self.save_cache(cache_data)
-                    cache_cleared = True
                     print(f"✅ 已清理所有 {self.cache_configs.get(data_type, {}).get('description', data_type)} 缓存 ({len(keys_to_remove)}项)")
                 else:
                     print(f"ℹ️  无 {data_type} 缓存数据")
                     
             else:
-                if os.path.exists(self.cache_file):
-                    os.remove(self.cache_file)
-                    cache_cleared = True
+                for key in cache_keys:
+                    self.delete_entry(key)
+                if cache_keys:
                     print("✅ 已清理所有股票数据缓存")
                 else:
-                    print("ℹ️  缓存文件不存在")
-            
-            if cache_cleared:
-                self.load_cache()
+                    print("ℹ️  无缓存数据")
                     
         except Exception as e:
             print(f"❌ 清理缓存失败: {e}")
@@ -246,8 +541,8 @@ class StockDataCache:
                 if stock_code and cached_stock_code != stock_code:
                     continue
                 cache_time = datetime.fromisoformat(cache_meta['timestamp'])
-                # 动态获取过期时间配置
-                expire_minutes = self._get_expire_minutes(data_type, cache_meta)
+                # 优先使用写入时记录的过期时间（非交易时段写入的条目可能比配置的更长）
+                expire_minutes = cache_meta.get('expire_minutes') or self._get_expire_minutes(data_type, cache_meta)
                 expire_time = cache_time + timedelta(minutes=expire_minutes)
                 is_valid = current_time < expire_time
                 remaining_minutes = (expire_time - current_time).total_seconds() / 60
@@ -282,7 +577,7 @@ class StockDataCache:
             print(f"📊 股票 {stock_code} 数据缓存状态")
         else:
             print("📊 股票数据缓存状态")
-        print(f"📁 缓存文件: {self.cache_file}")
+        print(f"📁 缓存目录: {self.entry_dir}")
         print("=" * 70)
         
         if not status:
@@ -296,11 +591,8 @@ class StockDataCache:
                 print(f"{status_icon} {info['stock_code']:<8} | {info['description']:<12} | {info['remaining']:<15} | 过期: {info['expire_minutes']}分钟")
         
         try:
-            if os.path.exists(self.cache_file):
-                file_size = os.path.getsize(self.cache_file) / 1024  # KB
-                print(f"💾 缓存文件大小: {file_size:.1f} KB")
-            else:
-                print("💾 缓存文件: 不存在")
+            total_size = sum(os.path.getsize(self._get_entry_path(key)) for key in self.list_cache_keys()) / 1024  # KB
+            print(f"💾 缓存总大小: {total_size:.1f} KB")
         except Exception:
             pass
         
@@ -309,10 +601,13 @@ class StockDataCache:
 
 # 全局缓存管理器实例
 _cache_manager = None
+_cache_manager_lock = threading.Lock()
 
 def get_cache_manager() -> StockDataCache:
-    """获取全局缓存管理器实例"""
+    """获取全局缓存管理器实例（线程安全）"""
     global _cache_manager
     if _cache_manager is None:
-        _cache_manager = StockDataCache()
+        with _cache_manager_lock:
+            if _cache_manager is None:
+                _cache_manager = StockDataCache()
     return _cache_manager
@@ -2,28 +2,30 @@
 股票数据工具模块 - 统一的股票数据获取和缓存管理
 """
 
-import sys
-import os
+import time
+import asyncio
+import functools
+import logging
+import threading
 import warnings
-import pandas as pd
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Any
-
-# 添加路径以便导入
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-if project_root not in sys.path:
-    sys.path.append(project_root)
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from operator import itemgetter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Any
 
 warnings.filterwarnings('ignore')
 
+logger = logging.getLogger(__name__)
+
 # 导入必要的模块
 from stock.stock_utils import (
     fetch_stock_basic_info, fetch_stock_technical_indicators,
-    fetch_stock_news_data, fetch_stock_chip_data
+    fetch_stock_news_data, fetch_stock_chip_data, kline_to_dataframe, dataframe_to_records, dataframe_to_columns, add_moving_averages
 )
 from stock.stock_data_fetcher import data_manager, KLineType
 from stock.stock_data_cache import get_cache_manager
-from utils.format_utils import judge_rsi_level
+from utils.format_utils import judge_rsi_level, now_str
 
 # 导入AI分析模块
 try:
@@ -37,6 +39,124 @@ except ImportError:
     AI_ANALYSIS_AVAILABLE = False
     print("⚠️ AI分析模块不可用，请检查依赖是否正确安装")
 
+# 股票摘要字段表：(摘要键, 源数据键, 默认值)
+_BASIC_SUMMARY_FIELDS = (
+    ('current_price', 'current_price', 0),
+    ('change_percent', 'change_percent', 0),
+    ('stock_name', 'name', ''),
+    ('industry', 'industry', ''),
+)
+_CHIP_SUMMARY_FIELDS = (
+    ('profit_ratio', 'profit_ratio', 0),
+    ('avg_cost', 'avg_cost', 0),
+)
+_NEWS_SUMMARY_FIELDS = (
+    ('news_count', 'news_count', 0),
+)
+
+
+def _summary_extractor(fields):
+    """根据字段表生成提取函数：字段齐全时用itemgetter一次取出，缺字段时逐个取默认值"""
+    getter = itemgetter(*(source for _, source, _ in fields))
+    names = tuple(name for name, _, _ in fields)
+    
+    def extract(data: Dict) -> Dict:
+        try:
+            values = getter(data)
+        except KeyError:
+            values = tuple(data.get(source, default) for _, source, default in fields)
+        return dict(zip(names, values))
+    return extract
+
+
+_extract_basic_summary = _summary_extractor(_BASIC_SUMMARY_FIELDS)
+_extract_chip_summary = _summary_extractor(_CHIP_SUMMARY_FIELDS)
+_extract_news_summary = _summary_extractor(_NEWS_SUMMARY_FIELDS)
+
+
+def _extract_kline_summary(kline: Dict) -> Dict:
+    """从K线数据的技术指标中提取趋势和RSI等级"""
+    indicators = kline.get('indicators', {})
+    return {
+        'technical_trend': f"{indicators.get('ma_trend', '未知')} | MACD {indicators.get('macd_trend', '未知')}",
+        'rsi_level': judge_rsi_level(indicators.get('rsi_14', 50)),
+    }
+
+
+# 股票摘要的组成：(报告中的数据键, 提取函数)，按顺序合并
+_SUMMARY_SECTIONS = (
+    ('basic_info', _extract_basic_summary),
+    ('kline_data', _extract_kline_summary),
+    ('news_data', _extract_news_summary),
+    ('chip_data', _extract_chip_summary),
+)
+
+_AI_UNAVAILABLE_MSG = "AI分析模块不可用，请检查依赖是否正确安装"
+
+
+def _error_result(prefix: str, error: Exception) -> Tuple[str, str]:
+    """生成AI分析失败时返回的 (错误信息, 时间) 元组"""
+    return f"{prefix}: {error}", now_str()
+
+
+# 拉取失败结果的记忆时长（秒），期间相同请求直接返回错误，避免对无效代码反复请求网络
+FAILED_FETCH_TTL_SECONDS = 60
+# 最多记住的拉取失败请求数，超出时淘汰最久未用的
+FAILED_FETCH_CACHE_SIZE = 256
+
+
+def _cached_fetch(data_type: str, fail_message: str, should_cache=None):
+    """数据拉取缓存装饰器
+    
+    统一处理 检查缓存 -> 拉取数据 -> 写入缓存 -> 失败回退缓存 的流程，被装饰的方法只负责具体拉取。
+    被装饰方法签名为 (self, stock_code, *args, **kwargs)，包装后额外接受 use_cache、force_refresh 关键字参数。
+    should_cache(data, *args, **kwargs) 可进一步限制哪些拉取结果写入缓存。
+    拉取返回错误时会短时间记住该错误，非强制刷新的重复请求直接返回，不再访问网络。
+    """
+    def decorator(fetch_func):
+        @functools.wraps(fetch_func)
+        def wrapper(self, stock_code: str, *args, use_cache: bool = True, force_refresh: bool = False, **kwargs) -> Dict:
+            cache_manager = self.cache_manager
+            description = self._cache_desc[data_type]
+            
+            check_cache = use_cache and not force_refresh
+            if check_cache:
+                cached = cache_manager.get_valid_cached_data(data_type, stock_code)
+                if cached is not None:
+                    logger.debug("📋 使用缓存的 %s %s", stock_code, description)
+                    return cached
+            
+            flight_key = (data_type, stock_code) + args + tuple(sorted(kwargs.items()))
+            if not force_refresh:
+                failure_error = self._get_recent_failure(flight_key)
+                if failure_error is not None:
+                    logger.debug("⏭️ %s %s近期拉取失败，跳过重复请求", stock_code, description)
+                    return {'error': failure_error}
+            
+            def fetch_and_store():
+                # 成为本次拉取的执行者后再检查一次缓存：上一轮并发拉取可能刚好在首次检查之后写入了缓存
+                if check_cache:
+                    cached = cache_manager.get_valid_cached_data(data_type, stock_code)
+                    if cached is not None:
+                        return cached
+                data = fetch_func(self, stock_code, *args, **kwargs)
+                if data is not None and 'error' in data:
+                    self._remember_failure(flight_key, data['error'])
+                    return data
+                self._forget_failure(flight_key)
+                if data is not None and (should_cache is None or should_cache(data, *args, **kwargs)):
+                    cache_manager.save_cached_data(data_type, stock_code, data)
+                return data
+            
+            logger.info("📡 获取 %s %s...", stock_code, description)
+            try:
+                return self._run_singleflight(flight_key, fetch_and_store)
+            except Exception as e:
+                logger.error("%s: %s", fail_message, e)
+                return cache_manager.get_cached_data(data_type, stock_code) if use_cache else {'error': str(e)}
+        return wrapper
+    return decorator
+
 
 class StockTools:
     """统一的股票数据工具类"""
@@ -44,93 +164,153 @@ class StockTools:
     def __init__(self):
         """初始化股票工具"""
         self.cache_manager = get_cache_manager()
+        # 各数据类型的过期时间（分钟），缓存配置为静态配置，初始化时展平一次
+        cache_configs = self.cache_manager.cache_configs
+        self._expire_min = {key: config['expire_minutes'] for key, config in cache_configs.items()}
+        self._cache_desc = {key: config['description'] for key, config in cache_configs.items()}
+        # 正在进行中的数据拉取，相同key的并发请求共享同一次拉取结果
+        self._inflight: Dict[Tuple, Future] = {}
+        self._inflight_lock = threading.Lock()
+        # 近期拉取失败的请求：flight_key -> (失效时间戳, 错误信息)，LRU，与_inflight共用_inflight_lock
+        self._failed_fetches: "OrderedDict[Tuple, Tuple[float, str]]" = OrderedDict()
+
+    def _get_recent_failure(self, key: Tuple):
+        """返回未过期的拉取失败错误信息，没有或已过期时返回None（过期条目同时删除）"""
+        with self._inflight_lock:
+            failure = self._failed_fetches.get(key)
+            if failure is None:
+                return None
+            if failure[0] <= time.time():
+                del self._failed_fetches[key]
+                return None
+            self._failed_fetches.move_to_end(key)
+            return failure[1]
+
+    def _remember_failure(self, key: Tuple, error: str):
+        """记住拉取失败的请求，FAILED_FETCH_TTL_SECONDS内相同请求直接返回错误"""
+        with self._inflight_lock:
+            self._failed_fetches[key] = (time.time() + FAILED_FETCH_TTL_SECONDS, error)
+            self._failed_fetches.move_to_end(key)
+            while len(self._failed_fetches) > FAILED_FETCH_CACHE_SIZE:
+                self._failed_fetches.popitem(last=False)
+
+    def _forget_failure(self, key: Tuple):
+        """拉取成功后清除该请求的失败记录"""
+        with self._inflight_lock:
+            self._failed_fetches.pop(key, None)
+
+    def _run_singleflight(self, key: Tuple, func, *args, **kwargs):
+        """同一key同时只执行一次func，其余并发请求等待并共享其结果"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+        
+        if not is_owner:
+            result = future.result()
+            # 返回浅拷贝，避免调用方各自追加字段时互相影响
+            return dict(result) if isinstance(result, dict) else result
+        
+        try:
+            result = func(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _ai_analysis_entry(self, generate_method, fail_message: str, *args, **kwargs) -> Dict:
+        """调用generate_*_with_cache生成AI分析，返回附加到数据中的 {'report', 'timestamp'}，失败时返回 {'error', 'timestamp'}"""
+        try:
+            report, timestamp = generate_method(*args, **kwargs)
+            return {'report': report, 'timestamp': timestamp}
+        except Exception as e:
+            logger.error("%s: %s", fail_message, e)
+            return {'error': str(e), 'timestamp': now_str()}
+
+    @_cached_fetch('basic_info', "❌ 获取股票基本信息失败",
+                   should_cache=lambda data: data.get('current_price', 0) > 0)
+    def _fetch_basic_info(self, stock_code: str) -> Dict:
+        """拉取股票基本信息（只缓存价格有效的数据）"""
+        basic_data = fetch_stock_basic_info(stock_code)
+        if basic_data and basic_data.get('current_price', 0) > 0:
+            logger.debug("📈 %s 当前价格: %s", stock_code, basic_data['current_price'])
+        return basic_data
+
+    @_cached_fetch('technical_indicators', "❌ 获取技术指标失败",
+                   should_cache=lambda data, period, compute_risk=True: compute_risk)
+    def _fetch_technical_indicators(self, stock_code: str, period: int, compute_risk: bool = True) -> Dict:
+        """拉取技术指标和风险指标（未计算风险指标的结果不缓存）"""
+        return fetch_stock_technical_indicators(stock_code, period, compute_risk=compute_risk)
+
+    @_cached_fetch('news_data', "❌ 获取新闻数据失败")
+    def _fetch_news_data(self, stock_code: str) -> Dict:
+        """拉取股票新闻数据"""
+        return fetch_stock_news_data(stock_code)
+
+    @_cached_fetch('chip_data', "⚠️ 暂不支持拉取筹码数据")
+    def _fetch_chip_data(self, stock_code: str) -> Dict:
+        """拉取股票筹码数据"""
+        return fetch_stock_chip_data(stock_code)
 
     def get_basic_info(self, stock_identity: Dict, use_cache: bool = True, force_refresh: bool = False, 
                        include_ai_analysis: bool = False, include_company_analysis: bool = True, debug: bool = True) -> Dict:
         """获取股票基本信息（加锁防止并发重复拉取）"""
         
-        data_type = 'basic_info'
         stock_code = stock_identity['code']
-        basic_data = {}
-
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type, stock_code):
-            print(f"📋 使用缓存的 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}")
-            basic_data = self.cache_manager.get_cached_data(data_type, stock_code)
-        else:
-            print(f"📡 获取 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}...")
-            try:
-                basic_data = fetch_stock_basic_info(stock_code)
-                if basic_data is not None and 'error' not in basic_data:
-                    if "current_price" in basic_data and basic_data["current_price"] > 0:
-                        print(f"📈 {stock_code} 当前价格: {basic_data['current_price']}")
-                        self.cache_manager.save_cached_data(data_type, stock_code, basic_data)
-            except Exception as e:
-                print(f"❌ 获取股票基本信息失败: {e}")
-                basic_data = self.cache_manager.get_cached_data(data_type, stock_code) if use_cache else {'error': str(e)}
-
-        if include_ai_analysis and 'error' not in basic_data:
-            try:
-                ai_report, ai_timestamp = self.generate_fundamental_analysis_with_cache(
-                    stock_identity=stock_identity,
-                    fundamental_data=basic_data,
-                    use_cache=use_cache,
-                    force_refresh=force_refresh
-                )
-
-                basic_data['ai_analysis'] = {
-                    'report': ai_report,
-                    'timestamp': ai_timestamp
-                }
+        basic_data = self._fetch_basic_info(stock_code, use_cache=use_cache, force_refresh=force_refresh)
 
-            except Exception as e:
-                print(f"❌ 生成AI基本面分析失败: {e}")
-                basic_data['ai_analysis'] = {
-                    'error': str(e),
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
+        if 'error' in basic_data:
+            return basic_data
         
-        if include_company_analysis and 'error' not in basic_data:
-            try:
-                company_report, company_timestamp = self.generate_company_analysis_with_cache(
-                    stock_identity=stock_identity,
-                    fundamental_data=basic_data,
-                    use_cache=use_cache,
-                    force_refresh=force_refresh
-                )
-
-                basic_data['company_analysis'] = {
-                    'report': company_report,
-                    'timestamp': company_timestamp
-                }
-
-            except Exception as e:
-                print(f"❌ 生成公司分析失败: {e}")
-                basic_data['company_analysis'] = {
-                    'error': str(e),
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # 基本面分析和公司分析都只依赖基本信息，互不依赖
+        ai_tasks = {}
+        if include_ai_analysis:
+            ai_tasks['ai_analysis'] = (self.generate_fundamental_analysis_with_cache, "❌ 生成AI基本面分析失败")
+        if include_company_analysis:
+            ai_tasks['company_analysis'] = (self.generate_company_analysis_with_cache, "❌ 生成公司分析失败")
+        
+        ai_options = dict(stock_identity=stock_identity, fundamental_data=basic_data,
+                          use_cache=use_cache, force_refresh=force_refresh)
+        if len(ai_tasks) > 1:
+            # 两次AI调用并发执行，全部完成后再写回basic_data，避免生成过程中数据被修改
+            with ThreadPoolExecutor(max_workers=len(ai_tasks)) as executor:
+                futures = {
+                    key: executor.submit(self._ai_analysis_entry, generate_method, fail_message, **ai_options)
+                    for key, (generate_method, fail_message) in ai_tasks.items()
                 }
+                ai_results = {key: future.result() for key, future in futures.items()}
+        else:
+            ai_results = {
+                key: self._ai_analysis_entry(generate_method, fail_message, **ai_options)
+                for key, (generate_method, fail_message) in ai_tasks.items()
+            }
+        basic_data.update(ai_results)
         return basic_data
     
-    def get_stock_technical_indicators(self, stock_code: str, period: int = 160, use_cache: bool = True, force_refresh: bool = False) -> Dict:
-        """获取股票技术指标和风险指标（不缓存K线数据本身）"""
-        data_type = 'technical_indicators'
-                
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type, stock_code):
-            print(f"📋 使用缓存的 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}")
-            return self.cache_manager.get_cached_data(data_type, stock_code)
+    def get_stock_technical_indicators(self, stock_code: str, period: int = 160, use_cache: bool = True, force_refresh: bool = False,
+                                       compute_risk: bool = True) -> Dict:
+        """获取股票技术指标和风险指标（不缓存K线数据本身）
         
-        print(f"📡 获取 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}...")
-        try:
-            data = fetch_stock_technical_indicators(stock_code, period)
-            if data is not None and 'error' not in data:
-                self.cache_manager.save_cached_data(data_type, stock_code, data)
-            return data
-        except Exception as e:
-            print(f"❌ 获取技术指标失败: {e}")
-            return self.cache_manager.get_cached_data(data_type, stock_code) if use_cache else {'error': str(e)}
-
-    def get_stock_kline_data(self, stock_identity: Dict, period: int = 160, use_cache: bool = True, force_refresh: bool = False, include_ai_analysis: bool = False) -> Dict:
-        """获取股票K线数据（实时获取，不缓存K线数据本身，但返回包含技术指标的完整信息）"""
+        compute_risk为False时不计算风险指标，此时结果不完整，不写入缓存
+        """
+        return self._fetch_technical_indicators(stock_code, period, compute_risk=compute_risk,
+                                                use_cache=use_cache, force_refresh=force_refresh)
+
+    def get_stock_kline_data(self, stock_identity: Dict, period: int = 160, use_cache: bool = True, force_refresh: bool = False,
+                             include_ai_analysis: bool = False, compute_risk: bool = True, columnar: bool = True) -> Dict:
+        """获取股票K线数据（实时获取，不缓存K线数据本身，但返回包含技术指标的完整信息）
+        
+        只需要K线和技术指标的调用方可传入compute_risk=False，跳过风险指标计算
+        kline_data默认按列返回 {列名: 值列表}，省去逐行字典的构建，可直接用pd.DataFrame()还原；
+        需要逐行字典列表的调用方传入columnar=False
+        返回结果中的latest_data与kline_data共享数据，且结果会原样传给AI技术分析，调用方应只读使用
+        """
         stock_code = stock_identity['code']
 
         try:
@@ -141,45 +321,38 @@ class StockTools:
             )
             
             if kline_data and len(kline_data) > 0:
-                df = pd.DataFrame([k.__dict__ for k in kline_data])
-                df = df.sort_values('datetime')
+                df = kline_to_dataframe(kline_data)
                 
-                df['MA5'] = df['close'].rolling(window=5).mean()
-                df['MA10'] = df['close'].rolling(window=10).mean()
-                df['MA20'] = df['close'].rolling(window=20).mean()
+                add_moving_averages(df)
                 
                 indicators_data = self.get_stock_technical_indicators(
-                    stock_code, period, use_cache, force_refresh)
+                    stock_code, period, use_cache, force_refresh,
+                    compute_risk=compute_risk or include_ai_analysis)
+                
+                if columnar:
+                    kline_payload = dataframe_to_columns(df)
+                    latest_data = {col: values[-1] for col, values in kline_payload.items()} if len(df) > 0 else {}
+                else:
+                    kline_payload = dataframe_to_records(df)
+                    latest_data = kline_payload[-1] if kline_payload else {}  # 直接引用已转换的最后一行
                 
                 result = {
-                    'kline_data': df.to_dict('records'),  # K线数据实时返回
+                    'kline_data': kline_payload,  # K线数据实时返回
                     'indicators': indicators_data.get('indicators', {}),
                     'risk_metrics': indicators_data.get('risk_metrics', {}),  # 精简风险摘要（来自缓存）
                     'data_length': len(df),
-                    'latest_data': df.iloc[-1].to_dict() if len(df) > 0 else {},
-                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    'latest_data': latest_data,
+                    'update_time': now_str()
                 }
                 
                 if include_ai_analysis:
-                    try:
-                        ai_report, ai_timestamp = self.generate_tech_analysis_with_cache(
-                            stock_identity,
-                            kline_info=result,
-                            use_cache=use_cache,
-                            force_refresh=force_refresh
-                        )
-                        
-                        result['ai_analysis'] = {
-                            'report': ai_report,
-                            'timestamp': ai_timestamp
-                        }
-                        
-                    except Exception as e:
-                        print(f"❌ 生成AI技术分析失败: {e}")
-                        result['ai_analysis'] = {
-                            'error': str(e),
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        }
+                    result['ai_analysis'] = self._ai_analysis_entry(
+                        self.generate_tech_analysis_with_cache, "❌ 生成AI技术分析失败",
+                        stock_identity,
+                        kline_info=result,
+                        use_cache=use_cache,
+                        force_refresh=force_refresh
+                    )
                 
                 return result
             else:
@@ -188,90 +361,90 @@ class StockTools:
         except Exception as e:
             return {'error': str(e)}
 
+    def get_stock_latest_tick(self, stock_identity: Dict) -> Dict:
+        """获取最新一根日K线（只需要最新价格时使用，不构建DataFrame、不计算技术指标和风险指标）"""
+        stock_code = stock_identity['code']
+
+        try:
+            kline_data = data_manager.get_kline_data(stock_code, KLineType.DAY, 1)
+            if not kline_data:
+                return {'error': f"未获取到股票 {stock_code} 的K线数据"}
+            return dict(kline_data[-1].__dict__)
+        except Exception as e:
+            return {'error': str(e)}
+
     def get_stock_news_data(self, stock_identity: Dict[str, Any], use_cache: bool = True, force_refresh: bool = False, include_ai_analysis: bool = False) -> Dict:
         """获取股票新闻数据"""
-        data_type = 'news_data'
         stock_code = stock_identity['code']
-
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type, stock_code):
-            print(f"📋 使用缓存的 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}")
-            news_data = self.cache_manager.get_cached_data(data_type, stock_code)
-        else:
-            print(f"📡 获取 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}...")
-            try:
-                news_data = fetch_stock_news_data(stock_code)
-                if news_data is not None and 'error' not in news_data:
-                    self.cache_manager.save_cached_data(data_type, stock_code, news_data)
-            except Exception as e:
-                print(f"❌ 获取新闻数据失败: {e}")
-                news_data = self.cache_manager.get_cached_data(data_type, stock_code) if use_cache else {'error': str(e)}
+        news_data = self._fetch_news_data(stock_code, use_cache=use_cache, force_refresh=force_refresh)
         
         # 如果需要AI分析且新闻数据获取成功
         if include_ai_analysis and 'error' not in news_data:
-            try:                
-                ai_report, ai_timestamp = self.generate_news_analysis_with_cache(
-                    stock_identity=stock_identity,
-                    news_data=news_data.get('news_data', []),
-                    use_cache=use_cache,
-                    force_refresh=force_refresh
-                )
-                
-                news_data['ai_analysis'] = {
-                    'report': ai_report,
-                    'timestamp': ai_timestamp
-                }
-                
-            except Exception as e:
-                print(f"❌ 生成AI新闻分析失败: {e}")
-                news_data['ai_analysis'] = {
-                    'error': str(e),
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
+            news_data['ai_analysis'] = self._ai_analysis_entry(
+                self.generate_news_analysis_with_cache, "❌ 生成AI新闻分析失败",
+                stock_identity=stock_identity,
+                news_data=news_data.get('news_data', []),
+                use_cache=use_cache,
+                force_refresh=force_refresh
+            )
         
         return news_data
 
     def get_stock_chip_data(self, stock_identity: Dict[str, Any], use_cache: bool = True, force_refresh: bool = False, include_ai_analysis: bool = False) -> Dict:
         """获取股票筹码数据"""
-        data_type = 'chip_data'
         stock_code = stock_identity['code']
-
-        if use_cache and not force_refresh and self.cache_manager.is_cache_valid(data_type, stock_code):
-            print(f"📋 使用缓存的 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}")
-            chip_data = self.cache_manager.get_cached_data(data_type, stock_code)
-        else:
-            print(f"📡 获取 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}...")
-            try:
-                chip_data = fetch_stock_chip_data(stock_code)
-                if chip_data is not None and 'error' not in chip_data:
-                    self.cache_manager.save_cached_data(data_type, stock_code, chip_data)
-            except Exception as e:
-                print(f"⚠️ 暂不支持拉取筹码数据: {e}")
-                chip_data = self.cache_manager.get_cached_data(data_type, stock_code) if use_cache else {'error': str(e)}
+        chip_data = self._fetch_chip_data(stock_code, use_cache=use_cache, force_refresh=force_refresh)
         
         # 如果需要AI分析且筹码数据获取成功
         if include_ai_analysis and 'error' not in chip_data:
-            try:
-                ai_report, ai_timestamp = self.generate_chip_analysis_with_cache(
-                    stock_identity=stock_identity,
-                    chip_data=chip_data,
-                    use_cache=use_cache,
-                    force_refresh=force_refresh
-                )
-                
-                chip_data['ai_analysis'] = {
-                    'report': ai_report,
-                    'timestamp': ai_timestamp
-                }
-                
-            except Exception as e:
-                print(f"❌ 生成AI分析失败: {e}")
-                chip_data['ai_analysis'] = {
-                    'error': str(e),
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
+            chip_data['ai_analysis'] = self._ai_analysis_entry(
+                self.generate_chip_analysis_with_cache, "❌ 生成AI分析失败",
+                stock_identity=stock_identity,
+                chip_data=chip_data,
+                use_cache=use_cache,
+                force_refresh=force_refresh
+            )
         
         return chip_data
     
+    # =========================
+    # 异步接口
+    # =========================
+
+    # 底层数据源（akshare/efinance）均为同步接口，异步版本在线程中执行，使多个数据源的网络等待相互重叠
+
+    async def aget_basic_info(self, stock_identity: Dict, **kwargs) -> Dict:
+        """异步获取股票基本信息"""
+        return await asyncio.to_thread(self.get_basic_info, stock_identity, **kwargs)
+
+    async def aget_stock_kline_data(self, stock_identity: Dict, **kwargs) -> Dict:
+        """异步获取股票K线数据"""
+        return await asyncio.to_thread(self.get_stock_kline_data, stock_identity, **kwargs)
+
+    async def aget_stock_news_data(self, stock_identity: Dict[str, Any], **kwargs) -> Dict:
+        """异步获取股票新闻数据"""
+        return await asyncio.to_thread(self.get_stock_news_data, stock_identity, **kwargs)
+
+    async def aget_stock_chip_data(self, stock_identity: Dict[str, Any], **kwargs) -> Dict:
+        """异步获取股票筹码数据"""
+        return await asyncio.to_thread(self.get_stock_chip_data, stock_identity, **kwargs)
+
+    async def aget_all_stock_data(self, stock_identity: Dict[str, Any], use_cache: bool = True, force_refresh: bool = False) -> Dict:
+        """并发获取基本信息、K线、新闻和筹码数据，总耗时取决于最慢的数据源"""
+        options = {'use_cache': use_cache, 'force_refresh': force_refresh}
+        keys = ['basic_info', 'kline_info', 'news_data', 'chip_data']
+        results = await asyncio.gather(
+            self.aget_basic_info(stock_identity, include_company_analysis=False, **options),
+            self.aget_stock_kline_data(stock_identity, **options),
+            self.aget_stock_news_data(stock_identity, **options),
+            self.aget_stock_chip_data(stock_identity, **options),
+            return_exceptions=True
+        )
+        return {
+            key: {'error': str(result)} if isinstance(result, Exception) else result
+            for key, result in zip(keys, results)
+        }
+
     def get_cached_ai_analysis(self, stock_code: str, analysis_type: str = 'comprehensive', use_cache: bool = True) -> Dict:
         """获取AI分析数据"""
         data_type = 'ai_analysis'
@@ -281,45 +454,79 @@ class StockTools:
         
         if use_cache:
             try:
-                cache_data = self.cache_manager.load_cache()
-                if cache_key in cache_data:
-                    cache_meta = cache_data[cache_key].get('cache_meta', {})
-                    cache_time = datetime.fromisoformat(cache_meta['timestamp'])
-                    
-                    # 使用动态过期时间配置
-                    expire_minutes = self.cache_manager._get_expire_minutes(data_type, cache_meta)
-                    expire_time = cache_time + timedelta(minutes=expire_minutes)
-                    
-                    if datetime.now() < expire_time:
-                        print(f"📋 使用缓存的 {stock_code} {analysis_type} AI分析 (缓存有效期: {expire_minutes}分钟)")
-                        return cache_data[cache_key].get('data', {})
+                # 条目不存在时load_entry只做一次stat即返回，不读取也不解析任何缓存文件
+                entry = self.cache_manager.load_entry(cache_key)
+                if entry:
+                    cache_meta = entry.get('cache_meta', {})
+                    if self.cache_manager.is_meta_valid(data_type, cache_meta):
+                        if logger.isEnabledFor(logging.DEBUG):
+                            expire_minutes = self.cache_manager._get_expire_minutes(data_type, cache_meta)
+                            logger.debug("📋 使用缓存的 %s %s AI分析 (缓存有效期: %s分钟)", stock_code, analysis_type, expire_minutes)
+                        return dict(entry.get('data', {}))
             except Exception:
                 pass
         
         return {}
     
+    def get_cached_ai_analyses(self, stock_code: str, analysis_types: List[str]) -> Dict[str, Dict]:
+        """一次取出多种AI分析的有效缓存，返回 {分析类型: 数据}，缺失或过期的类型不包含在结果中"""
+        data_type = 'ai_analysis'
+        cache_manager = self.cache_manager
+        analyses = {}
+        for analysis_type in analysis_types:
+            try:
+                entry = cache_manager.load_entry(f"ai_analysis_{analysis_type}_{stock_code}")
+                if entry and cache_manager.is_meta_valid(data_type, entry.get('cache_meta', {})):
+                    analyses[analysis_type] = dict(entry.get('data', {}))
+            except Exception:
+                continue
+        return analyses
+    
     def set_ai_analysis(self, stock_code: str, analysis_type: str, analysis_data: Dict):
         """设置AI分析数据"""
-        """设置AI分析数据"""
-        analysis_data['update_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        analysis_data['update_time'] = now_str()
         
         # 使用AI分析专用缓存方法，自动处理动态过期时间
         self.cache_manager.set_ai_analysis_cache(stock_code, analysis_type, analysis_data)
         
-        # 获取对应的过期时间信息
-        expire_minutes = self.cache_manager._get_expire_minutes('ai_analysis', {'analysis_type': analysis_type})
-        print(f"💾 {stock_code} {analysis_type} AI分析已缓存 (有效期: {expire_minutes}分钟)")
+        if logger.isEnabledFor(logging.DEBUG):
+            expire_minutes = self._expire_min.get(f"ai_analysis_{analysis_type}", self._expire_min['ai_analysis'])
+            logger.debug("💾 %s %s AI分析已缓存 (有效期: %s分钟)", stock_code, analysis_type, expire_minutes)
     
     # =========================
     # AI分析报告方法
     # =========================
 
+    def _generate_ai_analysis(self, analysis_type: str, stock_identity: Dict, generate_func,
+                              check_cache: bool, **report_kwargs) -> Tuple[str, str]:
+        """按股票和分析类型单飞执行AI分析，成功时写入缓存，返回 (报告, 时间)
+        
+        缓存写入在单飞内完成，执行者开始前再检查一次缓存，避免并发请求在前一次结果写入前后重复调用AI
+        """
+        stock_code = stock_identity['code']
+        
+        def generate_and_store():
+            if check_cache:
+                cached_data = self.get_cached_ai_analysis(stock_code, analysis_type, use_cache=True)
+                if cached_data and 'report' in cached_data:
+                    return cached_data['report'], cached_data.get('timestamp', '')
+            
+            result = generate_func(stock_identity=stock_identity, **report_kwargs)
+            if result.success:
+                self.set_ai_analysis(stock_code, analysis_type, {
+                    'report': result.report,
+                    'timestamp': result.timestamp,
+                    'stock_name': stock_identity.get('name', '')
+                })
+            return result.report, result.timestamp
+        
+        return self._run_singleflight(('ai_analysis', analysis_type, stock_code), generate_and_store)
+
     def generate_fundamental_analysis_with_cache(self, stock_identity: Dict = None, fundamental_data: Dict = None,
                                                 use_cache: bool = True, force_refresh: bool = False) -> Tuple[str, str]:
         """生成基本面分析报告（带缓存）"""
         analysis_type = "fundamental"
         stock_code = stock_identity['code']
-        stock_name = stock_identity.get('name', '')
 
         if use_cache and not force_refresh:
             cached_data = self.get_cached_ai_analysis(stock_code, analysis_type, use_cache=True)
@@ -327,38 +534,23 @@ class StockTools:
                 return cached_data['report'], cached_data.get('timestamp', '')
         
         if not AI_ANALYSIS_AVAILABLE:
-            error_msg = "AI分析模块不可用，请检查依赖是否正确安装"
-            return error_msg, datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            return _AI_UNAVAILABLE_MSG, now_str()
         
         try:
-            result = generate_fundamental_analysis_report(
-                stock_identity=stock_identity,
+            return self._generate_ai_analysis(
+                analysis_type, stock_identity, generate_fundamental_analysis_report, use_cache and not force_refresh,
                 fundamental_data=fundamental_data or {}
             )
             
-            if result.success:
-                self.set_ai_analysis(stock_code, analysis_type, {
-                    'report': result.report,
-                    'timestamp': result.timestamp,
-                    'stock_name': stock_name
-                })
-                return result.report, result.timestamp
-            else:
-                return result.report, result.timestamp
-            
         except Exception as e:
-            import traceback
-            traceback.print_exc()
-            error_msg = f"基本面分析失败: {str(e)}"
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            return error_msg, timestamp
+            logger.debug("基本面分析失败", exc_info=True)
+            return _error_result("基本面分析失败", e)
 
     def generate_tech_analysis_with_cache(self, stock_identity: Dict, kline_info: Dict = None,
                                          use_cache: bool = True, force_refresh: bool = False) -> Tuple[str, str]:
         """生成股票技术分析报告（带缓存）"""
         analysis_type = "technical"
         stock_code = stock_identity['code']
-        stock_name = stock_identity.get('name', '')
 
         if use_cache and not force_refresh:
             cached_data = self.get_cached_ai_analysis(stock_code, analysis_type, use_cache=True)
@@ -366,36 +558,22 @@ class StockTools:
                 return cached_data['report'], cached_data.get('timestamp', '')
         
         if not AI_ANALYSIS_AVAILABLE:
-            error_msg = "AI分析模块不可用，请检查依赖是否正确安装"
-            return error_msg, datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            return _AI_UNAVAILABLE_MSG, now_str()
         
         try:            
-            result = generate_tech_analysis_report(
-                stock_identity=stock_identity,
-                kline_info=kline_info,
+            return self._generate_ai_analysis(
+                analysis_type, stock_identity, generate_tech_analysis_report, use_cache and not force_refresh,
+                kline_info=kline_info
             )
             
-            if result.success:
-                self.set_ai_analysis(stock_code, analysis_type, {
-                    'report': result.report,
-                    'timestamp': result.timestamp,
-                    'stock_name': stock_name
-                })
-                return result.report, result.timestamp
-            else:
-                return result.report, result.timestamp
-            
         except Exception as e:
-            error_msg = f"技术分析失败: {str(e)}"
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            return error_msg, timestamp
+            return _error_result("技术分析失败", e)
 
     def generate_news_analysis_with_cache(self, stock_identity: Dict[str, Any], news_data: List = None,
                                         use_cache: bool = True, force_refresh: bool = False) -> Tuple[str, str]:
         """生成新闻分析报告（带缓存）"""
         analysis_type = "news"
         stock_code = stock_identity['code']
-        stock_name = stock_identity['name']
 
         if use_cache and not force_refresh:
             cached_data = self.get_cached_ai_analysis(stock_code, analysis_type, use_cache=True)
@@ -403,8 +581,7 @@ class StockTools:
                 return cached_data['report'], cached_data.get('timestamp', '')
         
         if not AI_ANALYSIS_AVAILABLE:
-            error_msg = "AI分析模块不可用，请检查依赖是否正确安装"
-            return error_msg, datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            return _AI_UNAVAILABLE_MSG, now_str()
         
         try:
             if news_data is None:
@@ -414,25 +591,13 @@ class StockTools:
                 else:
                     news_data = []
             
-            result = generate_news_analysis_report(
-                stock_identity=stock_identity,
+            return self._generate_ai_analysis(
+                analysis_type, stock_identity, generate_news_analysis_report, use_cache and not force_refresh,
                 news_data=news_data
             )
             
-            if result.success:
-                self.set_ai_analysis(stock_code, analysis_type, {
-                    'report': result.report,
-                    'timestamp': result.timestamp,
-                    'stock_name': stock_name
-                })
-                return result.report, result.timestamp
-            else:
-                return result.report, result.timestamp
-            
         except Exception as e:
-            error_msg = f"新闻分析失败: {str(e)}"
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            return error_msg, timestamp
+            return _error_result("新闻分析失败", e)
     
     def generate_chip_analysis_with_cache(self, stock_identity: Dict[str, Any],
                                         chip_data: Dict = None,
@@ -440,7 +605,6 @@ class StockTools:
         """生成筹码分析报告（带缓存）"""
         analysis_type = "chip"
         stock_code = stock_identity['code']
-        stock_name = stock_identity.get('name', '')
 
         if use_cache and not force_refresh:
             cached_data = self.get_cached_ai_analysis(stock_code, analysis_type, use_cache=True)
@@ -448,39 +612,25 @@ class StockTools:
                 return cached_data['report'], cached_data.get('timestamp', '')
         
         if not AI_ANALYSIS_AVAILABLE:
-            error_msg = "AI分析模块不可用，请检查依赖是否正确安装"
-            return error_msg, datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            return _AI_UNAVAILABLE_MSG, now_str()
         
         try:
             if chip_data is None:
                 raise ValueError("无法获取筹码数据")
             
-            result = generate_chip_analysis_report(
-                stock_identity=stock_identity,
+            return self._generate_ai_analysis(
+                analysis_type, stock_identity, generate_chip_analysis_report, use_cache and not force_refresh,
                 chip_data=chip_data
             )
             
-            if result.success:
-                self.set_ai_analysis(stock_code, analysis_type, {
-                    'report': result.report,
-                    'timestamp': result.timestamp,
-                    'stock_name': stock_name
-                })
-                return result.report, result.timestamp
-            else:
-                return result.report, result.timestamp
-            
         except Exception as e:
-            error_msg = f"筹码分析失败: {str(e)}"
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            return error_msg, timestamp
+            return _error_result("筹码分析失败", e)
 
     def generate_company_analysis_with_cache(self, stock_identity: Dict = None, fundamental_data: Dict = None,
                                             use_cache: bool = True, force_refresh: bool = False) -> Tuple[str, str]:
         """生成公司分析报告（带缓存）"""
         analysis_type = "company"
         stock_code = stock_identity['code']
-        stock_name = stock_identity.get('name', '')
 
         if use_cache and not force_refresh:
             cached_data = self.get_cached_ai_analysis(stock_code, analysis_type, use_cache=True)
@@ -488,31 +638,17 @@ class StockTools:
                 return cached_data['report'], cached_data.get('timestamp', '')
         
         if not AI_ANALYSIS_AVAILABLE:
-            error_msg = "AI分析模块不可用，请检查依赖是否正确安装"
-            return error_msg, datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            return _AI_UNAVAILABLE_MSG, now_str()
         
         try:
-            result = generate_company_analysis_report(
-                stock_identity=stock_identity,
+            return self._generate_ai_analysis(
+                analysis_type, stock_identity, generate_company_analysis_report, use_cache and not force_refresh,
                 fundamental_data=fundamental_data or {}
             )
             
-            if result.success:
-                self.set_ai_analysis(stock_code, analysis_type, {
-                    'report': result.report,
-                    'timestamp': result.timestamp,
-                    'stock_name': stock_name
-                })
-                return result.report, result.timestamp
-            else:
-                return result.report, result.timestamp
-            
         except Exception as e:
-            import traceback
-            traceback.print_exc()
-            error_msg = f"公司分析失败: {str(e)}"
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            return error_msg, timestamp
+            logger.debug("公司分析失败", exc_info=True)
+            return _error_result("公司分析失败", e)
 
     def get_comprehensive_ai_analysis(self, stock_identity: Dict[str, Any], user_opinion: str = "", user_position: str="不确定",
                                      use_cache: bool = True, force_refresh: bool = False) -> Dict:
@@ -520,131 +656,125 @@ class StockTools:
         data_type = 'ai_analysis'
         analysis_type = 'comprehensive'
         stock_code = stock_identity['code']
+        current_user_opinion = user_opinion.strip()
 
         cache_key = f"{data_type}_{analysis_type}_{stock_code}"
+        check_cache = use_cache and not force_refresh
         
-        # 检查缓存（需要同时检查时间有效性和用户观点是否变化）
-        if use_cache and not force_refresh:
-            try:
-                cache_data = self.cache_manager.load_cache()
-                if cache_key in cache_data:
-                    cache_meta = cache_data[cache_key].get('cache_meta', {})
-                    cache_time = datetime.fromisoformat(cache_meta['timestamp'])
-                    expire_time = cache_time + timedelta(minutes=self.cache_manager.cache_configs[data_type]['expire_minutes'])
-                    
-                    # 获取缓存中的用户观点和当前用户观点进行比较
-                    cached_user_opinion = cache_meta.get('user_opinion', '')
-                    current_user_opinion = user_opinion.strip()
-                    
-                    # 只有在缓存未过期且用户观点相同时才使用缓存
-                    if datetime.now() < expire_time and cached_user_opinion == current_user_opinion:
-                        print(f"📋 使用缓存的 {stock_code} 综合分析 (用户观点: {'有' if current_user_opinion else '无'})")
-                        return cache_data[cache_key].get('data', {})
-                    elif cached_user_opinion != current_user_opinion:
-                        print(f"🔄 用户观点已变化，重新生成 {stock_code} 综合分析")
-            except Exception:
-                pass
+        if check_cache:
+            cached_analysis = self._get_cached_comprehensive_analysis(cache_key, stock_code, current_user_opinion)
+            if cached_analysis is not None:
+                return cached_analysis
         
         # 生成新的综合分析
         try:
             if not AI_ANALYSIS_AVAILABLE:
                 return {
                     'error': 'AI分析模块不可用，请检查依赖是否正确安装',
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    'timestamp': now_str()
                 }
             
-            print(f"🤖 生成 {stock_code} 综合AI分析...")
-            
             from stock.stock_ai_analysis import generate_comprehensive_analysis_report
             from market.market_data_tools import get_market_tools
             
-            market_tools = get_market_tools()
-            
-            result = generate_comprehensive_analysis_report(
-                stock_identity=stock_identity,
-                user_opinion=user_opinion,
-                user_position=user_position,
-                stock_tools=self,
-                market_tools=market_tools
-            )
-            
-            if result.success:
-                report = result.report
+            def generate_and_store():
+                # 等待前一次生成期间结果可能已写入缓存
+                if check_cache:
+                    cached_analysis = self._get_cached_comprehensive_analysis(cache_key, stock_code, current_user_opinion)
+                    if cached_analysis is not None:
+                        return cached_analysis
+                
+                logger.info("🤖 生成 %s 综合AI分析...", stock_code)
+                result = generate_comprehensive_analysis_report(
+                    stock_identity=stock_identity,
+                    user_opinion=user_opinion,
+                    user_position=user_position,
+                    stock_tools=self,
+                    market_tools=get_market_tools()
+                )
+                if not result.success:
+                    # 分析失败，直接返回错误，不缓存
+                    return {
+                        'error': result.report,
+                        'timestamp': now_str()
+                    }
+                
                 data_sources = result.data_sources or []
+                now = datetime.now()
+                analysis_time = now.strftime('%Y-%m-%d %H:%M:%S')
                 
                 analysis_data = {
-                    'report': report,
+                    'report': result.report,
                     'data_sources': data_sources,
                     'analysis_info': {
-                        'analysis_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        'analysis_time': analysis_time,
                         'data_sources_count': len(data_sources),
-                        'user_opinion_included': bool(user_opinion.strip()),
-                        'user_opinion': user_opinion.strip() if user_opinion.strip() else None
+                        'user_opinion_included': bool(current_user_opinion),
+                        'user_opinion': current_user_opinion or None
                     },
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'cache_time': datetime.now().isoformat()
+                    'timestamp': analysis_time,
+                    'cache_time': now.isoformat()
                 }
-            else:
-                # 分析失败，直接返回错误，不缓存
-                return {
-                    'error': result.report,
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-            
-            try:
-                cache_data = self.cache_manager.load_cache()
-                cache_data[cache_key] = {
-                    'cache_meta': {
-                        'timestamp': datetime.now().isoformat(),
-                        'data_type': data_type,
-                        'stock_code': stock_code,
-                        'analysis_type': analysis_type,
-                        'expire_minutes': self.cache_manager.cache_configs[data_type]['expire_minutes'],
-                        'user_opinion': user_opinion.strip(),  # 存储用户观点到缓存元数据
-                        'user_position': user_position
-                    },
-                    'data': analysis_data
+                
+                expire_minutes = self._expire_min[data_type]
+                cache_meta = {
+                    'timestamp': analysis_data['cache_time'],
+                    'expires_at': now.timestamp() + expire_minutes * 60,
+                    'data_type': data_type,
+                    'stock_code': stock_code,
+                    'analysis_type': analysis_type,
+                    'expire_minutes': expire_minutes,
+                    'user_opinion': current_user_opinion,  # 存储用户观点到缓存元数据
+                    'user_position': user_position
                 }
-                self.cache_manager.save_cache(cache_data)
-                print(f"💾 {stock_code} 综合分析已缓存 (用户观点: {'有' if user_opinion.strip() else '无'})")
-            except Exception as e:
-                print(f"❌ 缓存综合分析失败: {e}")
+                try:
+                    self.cache_manager.upsert(cache_key, {'cache_meta': cache_meta, 'data': analysis_data})
+                    logger.debug("💾 %s 综合分析已缓存 (用户观点: %s)", stock_code, '有' if current_user_opinion else '无')
+                except Exception as e:
+                    logger.error("❌ 缓存综合分析失败: %s", e)
+                return analysis_data
             
-            return analysis_data
+            # 缓存检查、生成和写入都在单飞内完成，并发的相同请求只调用一次AI
+            return self._run_singleflight(
+                (data_type, analysis_type, stock_code, current_user_opinion, user_position),
+                generate_and_store
+            )
             
         except Exception as e:
-            print(f"❌ 生成综合分析失败: {e}")
+            logger.error("❌ 生成综合分析失败: %s", e)
             return {
                 'error': str(e),
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'timestamp': now_str()
             }
     
+    def _get_cached_comprehensive_analysis(self, cache_key: str, stock_code: str, current_user_opinion: str) -> Optional[Dict]:
+        """读取综合分析缓存，缓存未过期且用户观点相同时返回数据副本，否则返回None"""
+        try:
+            entry = self.cache_manager.load_entry(cache_key)
+            if not entry:
+                return None
+            cache_meta = entry.get('cache_meta', {})
+            
+            # 获取缓存中的用户观点和当前用户观点进行比较
+            cached_user_opinion = cache_meta.get('user_opinion', '')
+            
+            # 只有在缓存未过期且用户观点相同时才使用缓存
+            if self.cache_manager.is_meta_valid('ai_analysis', cache_meta) and cached_user_opinion == current_user_opinion:
+                logger.debug("📋 使用缓存的 %s 综合分析 (用户观点: %s)", stock_code, '有' if current_user_opinion else '无')
+                return dict(entry.get('data', {}))
+            elif cached_user_opinion != current_user_opinion:
+                logger.debug("🔄 用户观点已变化，重新生成 %s 综合分析", stock_code)
+        except Exception:
+            pass
+        return None
+    
     def _generate_stock_summary(self, report: Dict) -> Dict:
         """生成股票摘要"""
         summary = {}
-        
-        basic = report['basic_info']
-        if basic and 'error' not in basic:
-            summary['current_price'] = basic.get('current_price', 0)
-            summary['change_percent'] = basic.get('change_percent', 0)
-            summary['stock_name'] = basic.get('name', '')
-            summary['industry'] = basic.get('industry', '')
-        
-        kline = report['kline_data']
-        if kline and 'error' not in kline:
-            indicators = kline.get('indicators', {})
-            summary['technical_trend'] = f"{indicators.get('ma_trend', '未知')} | MACD {indicators.get('macd_trend', '未知')}"
-            summary['rsi_level'] = judge_rsi_level(indicators.get('rsi_14', 50))
-        
-        news = report['news_data']
-        if news and 'error' not in news:
-            summary['news_count'] = news.get('news_count', 0)
-        
-        chip = report['chip_data']
-        if chip and 'error' not in chip:
-            summary['profit_ratio'] = chip.get('profit_ratio', 0)
-            summary['avg_cost'] = chip.get('avg_cost', 0)
-        
+        for section, extract in _SUMMARY_SECTIONS:
+            data = report[section]
+            if data and 'error' not in data:
+                summary.update(extract(data))
         return summary
     
     def clear_cache(self, stock_code: str = None, data_type: str = None):
@@ -666,12 +796,15 @@ class StockTools:
 
 # 全局股票工具实例
 _stock_tools = None
+_stock_tools_lock = threading.Lock()
 
 def get_stock_tools() -> StockTools:
-    """获取全局股票工具实例"""
+    """获取全局股票工具实例（线程安全，多线程首次调用时也只创建一个实例）"""
     global _stock_tools
     if _stock_tools is None:
-        _stock_tools = StockTools()
+        with _stock_tools_lock:
+            if _stock_tools is None:
+                _stock_tools = StockTools()
     return _stock_tools
 
 def show_stock_cache_status(stock_code: str = None):
@@ -1,60 +1,242 @@
 import sys
 import os
-import datetime
-from typing import Dict, Any
+import asyncio
+import hashlib
+import html
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Dict, List, Any, Iterator, Optional, Tuple
 
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 if project_root not in sys.path:
     sys.path.append(project_root)
 
 from stock.stock_data_tools import get_stock_tools
-from utils.report_utils import generate_pdf_report, generate_docx_report, generate_markdown_file, generate_html_report
 from utils.data_formatters import get_stock_formatter
+from utils.format_utils import now_str
 from version import get_version, get_full_version
 
+logger = logging.getLogger(__name__)
+
+# 报告各部分的获取结果：(部分名称, 股票代码, 市场, 获取参数) -> (过期时间, 数据)
+# 短时间内重复生成同一股票的报告（如逐个导出不同格式）时跳过整个获取流程
+_section_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_section_cache_lock = threading.Lock()
+SECTION_CACHE_SIZE = 256
+SECTION_CACHE_TTL = 300  # 秒，保证行情数据的时效
+# 各部分数据中附带的AI分析字段
+_SECTION_AI_KEYS = ('ai_analysis', 'company_analysis')
+
+
+def _has_error_report(ai_reports) -> bool:
+    """任一AI分析结果为错误信息（包含error字段的字典）时返回True"""
+    return any(isinstance(ai_report, dict) and 'error' in ai_report for ai_report in ai_reports)
+
+
+def _fetch_section(section: str, func, stock_identity: Dict[str, Any], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """获取报告的一个部分，有效期内的成功结果直接复用
+    
+    数据或其附带的AI分析失败时不缓存，下次生成报告时重新获取
+    """
+    key = (section, stock_identity['code'], stock_identity.get('market_name', ''),
+           tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _section_cache_lock:
+        entry = _section_cache.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _section_cache.move_to_end(key)
+                return entry[1]
+            del _section_cache[key]
+    
+    data = func(stock_identity, **kwargs)
+    if data and 'error' not in data and not _has_error_report(data.get(ai_key) for ai_key in _SECTION_AI_KEYS):
+        with _section_cache_lock:
+            _section_cache[key] = (now + SECTION_CACHE_TTL, data)
+            while len(_section_cache) > SECTION_CACHE_SIZE:
+                _section_cache.popitem(last=False)
+    return data
+
+
+# 已生成的PDF/Word/HTML报告落盘缓存，同一小时内以相同选项再次导出时直接读取文件
+REPORT_FILE_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     "data", "cache", "reports")
+REPORT_FILE_CACHE_TTL = 3600  # 秒
+_FILE_CACHED_FORMATS = frozenset(('pdf', 'docx', 'html'))
+
+
+def _report_file_path(stock_identity: Dict[str, Any], format_type: str, flags: tuple) -> str:
+    """按 (股票代码, 市场, 小时, 格式, AI选项) 生成报告缓存文件路径"""
+    key = (stock_identity['code'], stock_identity.get('market_name', ''),
+           time.strftime('%Y%m%d%H'), format_type, flags)
+    digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(REPORT_FILE_CACHE_DIR, f"{stock_identity['code']}_{digest}.{format_type}")
+
+
+def _read_report_file(path: str):
+    """读取未过期的报告缓存文件，不存在或已过期时返回None"""
+    try:
+        if time.time() - os.path.getmtime(path) >= REPORT_FILE_CACHE_TTL:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_report_file(path: str, content: bytes):
+    """写入报告缓存文件（先写临时文件再替换），并顺带清理过期文件"""
+    try:
+        os.makedirs(REPORT_FILE_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        
+        expire_before = time.time() - REPORT_FILE_CACHE_TTL
+        with os.scandir(REPORT_FILE_CACHE_DIR) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime < expire_before:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    # 其他进程或线程已清理该文件
+                    pass
+    except OSError as e:
+        logger.warning("⚠️ 报告缓存文件写入失败: %s", e)
+
+
+# 各导出格式对应 utils.report_utils 中的生成函数名，未列出的格式直接返回Markdown文本
+# report_utils 导入时会检测pandoc和weasyprint（启动子进程），因此到首次导出时才导入
+_RENDERERS = {
+    'pdf': 'generate_pdf_report',
+    'docx': 'generate_docx_report',
+    'html': 'generate_html_report',
+    'markdown': 'generate_markdown_file',
+}
+
+
+def _get_renderer(format_type: str):
+    """返回格式对应的生成函数，未知格式返回None"""
+    name = _RENDERERS.get(format_type)
+    if name is None:
+        return None
+    from utils import report_utils
+    return getattr(report_utils, name)
+
+
+def _render_error_html(md_content: str) -> bytes:
+    """错误页直接拼成简单HTML，不经过pandoc"""
+    title, _, message = md_content.partition('\n')
+    body = html.escape(message.strip()).replace('\n', '<br>\n')
+    return (f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>分析报告</title></head>\n'
+            f'<body><h1>{html.escape(title.lstrip("# "))}</h1>\n<p>{body}</p></body></html>\n').encode('utf-8')
+
+
+@lru_cache(maxsize=32)
+def _render_error_document(format_type: str, md_content: str):
+    """PDF/Word错误文档仍需pandoc生成，相同错误信息只生成一次"""
+    return _get_renderer(format_type)(md_content)
+
+
+# 错误信息只有一两行，HTML直接生成，PDF/Word按错误信息缓存，Markdown与正常导出相同
+_ERROR_RENDERERS = {
+    'pdf': partial(_render_error_document, 'pdf'),
+    'docx': partial(_render_error_document, 'docx'),
+    'html': _render_error_html,
+}
+
+
+def _render_one(md_content: str, format_type: str, renderers: Dict[str, Any] = None):
+    """把Markdown文本转换为单个指定格式，renderers可覆盖部分格式的生成函数"""
+    renderer = renderers.get(format_type) if renderers else None
+    if renderer is None:
+        renderer = _get_renderer(format_type)
+    return renderer(md_content) if renderer else md_content
+
+
+def _render_report(md_content: str, format_type, renderers: Dict[str, Any] = None):
+    """按格式输出报告：format_type为字符串时返回该格式的内容；
+    为列表/元组时各格式并发生成，返回 {格式: 内容}
+    """
+    if isinstance(format_type, str):
+        return _render_one(md_content, format_type, renderers)
+    
+    format_types = list(dict.fromkeys(format_type))
+    if len(format_types) <= 1:
+        return {fmt: _render_one(md_content, fmt, renderers) for fmt in format_types}
+    with ThreadPoolExecutor(max_workers=len(format_types)) as executor:
+        futures = {fmt: executor.submit(_render_one, md_content, fmt, renderers) for fmt in format_types}
+        return {fmt: future.result() for fmt, future in futures.items()}
+
 
 def generate_stock_report(stock_identity: Dict[str, Any], 
                           format_type="pdf",
                           has_fundamental_ai=False, has_market_ai=False,
                           has_news_ai=False, has_chip_ai=False,
-                          has_company_ai=False, has_comprehensive_ai=False):
-    """生成完整的股票分析报告（安全版本，完全独立于Streamlit）"""
+                          has_company_ai=False, has_comprehensive_ai=False,
+                          fetch_executor: Optional[ThreadPoolExecutor] = None):
+    """生成完整的股票分析报告（安全版本，完全独立于Streamlit）
+    
+    format_type可传入格式列表（如 ["pdf", "docx"]），数据只获取一次，各格式并发生成，返回 {格式: 内容}；
+    fetch_executor为各部分数据获取使用的线程池，不传时为本次报告单独创建
+    """
+    cache_path = None
+    if isinstance(format_type, str) and format_type in _FILE_CACHED_FORMATS:
+        flags = (has_fundamental_ai, has_market_ai, has_news_ai, has_chip_ai, has_company_ai, has_comprehensive_ai)
+        cache_path = _report_file_path(stock_identity, format_type, flags)
+        cached_report = _read_report_file(cache_path)
+        if cached_report is not None:
+            return cached_report
+    
+    stock_tools = get_stock_tools()
     try:
-        stock_tools = get_stock_tools()
         report_data = {}
+        # 任一部分数据或AI分析失败时报告不完整，不写入报告缓存文件，下次导出时重新生成
+        has_error = False
         
-        # 收集基本信息
-        try:
-            basic_info = stock_tools.get_basic_info(stock_identity, use_cache=True, include_ai_analysis=has_fundamental_ai, include_company_analysis=has_company_ai)
-            if 'error' not in basic_info and basic_info:
-                report_data['basic_info'] = basic_info
-        except Exception as e:
-            report_data['basic_info'] = {'error': str(e)}
-        
-        # 收集行情数据
-        try:
-            kline_info = stock_tools.get_stock_kline_data(stock_identity, period=160, use_cache=True, include_ai_analysis=has_market_ai)
-            if 'error' not in kline_info and kline_info:
-                report_data['kline_info'] = kline_info
-        except Exception as e:
-            report_data['kline_info'] = {'error': str(e)}
+        # 基本信息、行情、新闻、筹码相互独立，并发获取，总耗时取决于最慢的一项
+        fetch_tasks = {
+            'basic_info': (stock_tools.get_basic_info,
+                           dict(use_cache=True, include_ai_analysis=has_fundamental_ai, include_company_analysis=has_company_ai)),
+            'kline_info': (stock_tools.get_stock_kline_data,
+                           dict(period=160, use_cache=True, include_ai_analysis=has_market_ai, columnar=True)),
+            'news_data': (stock_tools.get_stock_news_data,
+                          dict(use_cache=True, include_ai_analysis=has_news_ai)),
+        }
+        # 筹码数据仅A股和基金
+        if stock_identity.get('market_name', "") != '港股':
+            fetch_tasks['chip_data'] = (stock_tools.get_stock_chip_data,
+                                        dict(use_cache=True, include_ai_analysis=has_chip_ai))
         
-        # 收集新闻数据
+        executor = fetch_executor or ThreadPoolExecutor(max_workers=len(fetch_tasks))
         try:
-            news_info = stock_tools.get_stock_news_data(stock_identity, use_cache=True, include_ai_analysis=has_news_ai)
-            if 'error' not in news_info and news_info:
-                report_data['news_data'] = news_info
-        except Exception as e:
-            report_data['news_data'] = {'error': str(e)}
+            futures = {
+                key: executor.submit(_fetch_section, key, func, stock_identity, kwargs)
+                for key, (func, kwargs) in fetch_tasks.items()
+            }
+            for key, future in futures.items():
+                try:
+                    data = future.result()
+                    if 'error' not in data and data:
+                        report_data[key] = data
+                    else:
+                        has_error = True
+                except Exception as e:
+                    report_data[key] = {'error': str(e)}
+                    has_error = True
+        finally:
+            if executor is not fetch_executor:
+                executor.shutdown()
         
-        # 收集筹码数据（仅A股和基金）
-        if stock_identity.get('market_name', "") != '港股':
-            try:
-                chip_data = stock_tools.get_stock_chip_data(stock_identity, use_cache=True, include_ai_analysis=has_chip_ai)
-                if 'error' not in chip_data and chip_data:
-                    report_data['chip_data'] = chip_data
-            except Exception as e:
-                report_data['chip_data'] = {'error': str(e)}
+        # 所有数据都获取失败时（如代码无效或已退市），不再生成AI分析和组装报告
+        if not any('error' not in data for data in report_data.values()):
+            raise ValueError(f"未获取到 {stock_identity['code']} 的任何数据")
         
         # 收集综合分析
         if has_comprehensive_ai:
@@ -62,8 +244,10 @@ def generate_stock_report(stock_identity: Dict[str, Any],
                 comprehensive_analysis = stock_tools.get_comprehensive_ai_analysis(stock_identity, use_cache=True)
                 if 'error' not in comprehensive_analysis:
                     report_data['comprehensive_analysis'] = comprehensive_analysis
+                else:
+                    has_error = True
             except Exception as e:
-                pass
+                has_error = True
                 
         final_ai_reports = {}
         
@@ -93,218 +277,187 @@ def generate_stock_report(stock_identity: Dict[str, Any],
                 final_ai_reports['comprehensive'] = report_data['comprehensive_analysis']
         
         report_data['ai_reports'] = final_ai_reports
+        has_error = has_error or _has_error_report(final_ai_reports.values())
         
         md_content = generate_markdown_report(stock_identity, report_data)
-        
-        if format_type == "pdf":
-            return generate_pdf_report(md_content)
-        elif format_type == "docx":
-            return generate_docx_report(md_content)
-        elif format_type == "html":
-            return generate_html_report(md_content)
-        elif format_type == "markdown":
-            return generate_markdown_file(md_content)
-        else:
-            return md_content
+        report = _render_report(md_content, format_type)
+        if cache_path and not has_error and isinstance(report, bytes):
+            _write_report_file(cache_path, report)
+        return report
             
     except Exception as e:
         error_msg = f"生成报告失败: {str(e)}"
-        if format_type == "pdf":
-            return generate_pdf_report(f"# 错误\n\n{error_msg}")
-        elif format_type == "docx":
-            return generate_docx_report(f"# 错误\n\n{error_msg}")
-        elif format_type == "html":
-            return generate_html_report(f"# 错误\n\n{error_msg}")
-        elif format_type == "markdown":
-            return generate_markdown_file(f"# 错误\n\n{error_msg}")
-        else:
-            return f"# 错误\n\n{error_msg}"
-
-
-def generate_markdown_report(stock_identity: Dict[str, Any], report_data: Dict[str, Any]) -> str:
-    """生成Markdown格式报告"""
-    stock_code = stock_identity['code']
-    stock_name = stock_identity['name']
-    market_type = stock_identity['market_name']
+        return _render_report(f"# 错误\n\n{error_msg}", format_type, _ERROR_RENDERERS)
 
-    current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    md_content = f"""# {stock_name}({stock_code}) 完整分析报告
 
-**市场类型**: {market_type}  
-**报告生成时间**: {current_time}  
-**生成工具**: {get_full_version()}
+def generate_stock_reports(stock_identities: List[Dict[str, Any]], format_type="pdf",
+                           max_workers: int = 4, **report_options) -> Dict[str, Any]:
+    """批量生成多只股票的分析报告，返回 {股票代码: 报告内容}
+    
+    各股票报告在线程池中并发生成；
+    所有报告的数据获取共用一个线程池（每只股票最多4个部分），不再为每份报告单独创建；
+    report_options 与 generate_stock_report 的 has_*_ai 参数相同
+    """
+    # 报告任务会阻塞等待数据获取结果，两者使用不同线程池，避免互相占满导致死锁
+    fetch_executor = ThreadPoolExecutor(max_workers=max_workers * 4)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                stock_identity['code']: executor.submit(generate_stock_report, stock_identity, format_type,
+                                                        fetch_executor=fetch_executor, **report_options)
+                for stock_identity in stock_identities
+            }
+            return {stock_code: future.result() for stock_code, future in futures.items()}
+    finally:
+        fetch_executor.shutdown()
 
-"""
 
-    # 综合分析部分
-    if 'comprehensive' in report_data['ai_reports']:
-        analysis_data = report_data['ai_reports']['comprehensive']
-        md_content += """
----
+async def agenerate_stock_report(stock_identity: Dict[str, Any], format_type="pdf", **report_options):
+    """异步生成股票分析报告，在线程中执行 generate_stock_report，不阻塞事件循环"""
+    return await asyncio.to_thread(generate_stock_report, stock_identity, format_type, **report_options)
 
-# 🎯 综合分析
 
-"""
-        
-        if 'analysis_info' in analysis_data:
-            info = analysis_data['analysis_info']
-            md_content += f"""## 分析信息
+async def agenerate_stock_reports(stock_identities: List[Dict[str, Any]], format_type="pdf",
+                                  **report_options) -> Dict[str, Any]:
+    """异步并发生成多只股票的分析报告，返回 {股票代码: 报告内容}"""
+    results = await asyncio.gather(*(
+        agenerate_stock_report(stock_identity, format_type, **report_options)
+        for stock_identity in stock_identities
+    ))
+    return {stock_identity['code']: result for stock_identity, result in zip(stock_identities, results)}
 
-- **分析时间**: {info.get('analysis_time', '未知')}
-- **数据来源**: {info.get('data_sources_count', 0)}个数据源
 
-"""
-        
-        if 'report' in analysis_data:
-            report_text = analysis_data['report']
-            report_time = analysis_data.get('timestamp', '')
-            
-            md_content += f"""{report_text}
+# 报告各部分的固定模板，只替换变量部分
+_REPORT_HEADER = """# {name}({code}) 完整分析报告
 
-*分析生成时间: {report_time}*
+**市场类型**: {market}  
+**报告生成时间**: {time}  
+**生成工具**: {tool}
 
 """
-
-    # 基本信息部分
-    basic_info = report_data.get('basic_info', {})
-    if 'error' not in basic_info and basic_info:
-        md_content += """
+_SECTION_HEADER = """
 ---
-        
-# 参考数据
 
-## 公司信息
+# {title}
 
-### 基本信息
 """
-        
-        # 使用统一格式化器
-        formatter = get_stock_formatter()
-        basic_info_text = formatter.format_basic_info(basic_info, stock_identity)
+_AI_SECTION = """## {title}
 
-        md_content += basic_info_text + "\n\n"
-        
-        if 'company' in report_data['ai_reports']:
-            company_report = report_data['ai_reports']['company']
-            report_text = company_report['report']
-            report_time = company_report.get('timestamp', '')
-            
-            md_content += f"""## 🏢 AI公司分析
+{report}
 
-{report_text}
-
-*分析生成时间: {report_time}*
+*分析生成时间: {time}*
 
 """
-        
-        if 'fundamental' in report_data['ai_reports']:
-            fundamental_report = report_data['ai_reports']['fundamental']
-            report_text = fundamental_report['report']
-            report_time = fundamental_report.get('timestamp', '')
-            
-            md_content += f"""## 🤖 AI基本面分析
-
-{report_text}
-
-*分析生成时间: {report_time}*
+_REPORT_FOOTER = """---
 
+*本报告由XYStock股票分析系统自动生成，仅供参考，不构成任何投资建议*
 """
-    
-    # 行情走势部分
-    kline_info = report_data.get('kline_info', {})
-    if 'error' not in kline_info and kline_info:
-        formatter = get_stock_formatter()
-        kline_text = formatter.format_kline_data(kline_info)
 
-        #df = pd.DataFrame(kline_info['kline_data']) # later remove
-        #last_row = df.iloc[-1]
-        
-        md_content += """
----
 
-# 📈 行情走势
+def _valid_section(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """数据为空或获取出错时返回None"""
+    return data if data and 'error' not in data else None
 
-"""
-        
-        md_content += kline_text + "\n\n"
 
-        if 'market' in report_data['ai_reports']:
-            market_report = report_data['ai_reports']['market']
-            report_text = market_report['report']
-            report_time = market_report.get('timestamp', '')
+@dataclass
+class ReportSections:
+    """报告各部分数据的快照，获取失败或无数据的部分为None"""
+    basic_info: Optional[Dict[str, Any]]
+    kline_info: Optional[Dict[str, Any]]
+    news_list: Optional[List[Dict[str, Any]]]
+    chip_data: Optional[Dict[str, Any]]
+    ai_reports: Dict[str, Any]
 
-            md_content += f"""## 🤖 AI行情分析
+    @classmethod
+    def from_report_data(cls, report_data: Dict[str, Any]) -> "ReportSections":
+        news_data = _valid_section(report_data.get('news_data'))
+        return cls(
+            basic_info=_valid_section(report_data.get('basic_info')),
+            kline_info=_valid_section(report_data.get('kline_info')),
+            news_list=news_data.get('news_data') or None if news_data else None,
+            chip_data=_valid_section(report_data.get('chip_data')),
+            ai_reports=report_data['ai_reports'],
+        )
 
-{report_text}
 
-*分析生成时间: {report_time}*
+def _append_ai_section(parts: List[str], ai_reports: Dict[str, Any], kind: str, title: str):
+    """报告中包含该类AI分析时追加对应小节"""
+    if kind in ai_reports:
+        ai_report = ai_reports[kind]
+        parts.append(_AI_SECTION.format(title=title, report=ai_report['report'],
+                                        time=ai_report.get('timestamp', '')))
 
-"""
+
+def iter_markdown_sections(stock_identity: Dict[str, Any], report_data: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    """逐部分生成Markdown报告，依次产出 (部分名称, Markdown文本)
     
-    # 新闻资讯部分
-    news_data = report_data.get('news_data', {})
-    if 'error' not in news_data and news_data and news_data.get('news_data'):
-        news_list = news_data['news_data']
-        md_content += f"""
----
+    调用方可边生成边展示或写出，无需等待整份报告拼装完成
+    """
+    stock_code = stock_identity['code']
+    stock_name = stock_identity['name']
+    market_type = stock_identity['market_name']
+    sections = ReportSections.from_report_data(report_data)
+    ai_reports = sections.ai_reports
 
-# 📰 新闻资讯
+    yield 'header', _REPORT_HEADER.format(name=stock_name, code=stock_code, market=market_type,
+                                          time=now_str(), tool=get_full_version())
 
-"""
-        
-        # 使用统一格式化器
-        formatter = get_stock_formatter()
-        news_text = formatter.format_stock_news_data(news_list, has_content=False)
-        
-        md_content += news_text + "\n\n"
+    # 综合分析部分
+    if 'comprehensive' in ai_reports:
+        analysis_data = ai_reports['comprehensive']
+        parts = [_SECTION_HEADER.format(title="🎯 综合分析")]
         
-        if 'news' in report_data['ai_reports']:
-            news_report = report_data['ai_reports']['news']
-            report_text = news_report['report']
-            report_time = news_report.get('timestamp', '')
-            
-            md_content += f"""## 🤖 AI新闻分析
-
-{report_text}
-
-*分析生成时间: {report_time}*
-
-"""
-    
-    # 筹码分析部分（仅A股）
-    chip_data = report_data.get('chip_data', {})
-    if 'error' not in chip_data and chip_data:
-        md_content += """
----
+        if 'analysis_info' in analysis_data:
+            info = analysis_data['analysis_info']
+            parts.append(f"""## 分析信息
 
-# 🧮 筹码分析
+- **分析时间**: {info.get('analysis_time', '未知')}
+- **数据来源**: {info.get('data_sources_count', 0)}个数据源
 
-"""
+""")
         
-        # 使用统一格式化器
-        formatter = get_stock_formatter()
-        chip_text = formatter.format_chip_data(chip_data)
+        if 'report' in analysis_data:
+            parts.append(f"""{analysis_data['report']}
 
-        md_content += chip_text + "\n\n"
-        
-        md_content += "\n"
-        
-        if 'chip' in report_data['ai_reports']:
-            chip_report = report_data['ai_reports']['chip']
-            report_text = chip_report['report']
-            report_time = chip_report.get('timestamp', '')
-            
-            md_content += f"""## 🤖 AI筹码分析
+*分析生成时间: {analysis_data.get('timestamp', '')}*
 
-{report_text}
+""")
+        yield 'comprehensive', "".join(parts)
 
-*分析生成时间: {report_time}*
+    formatter = get_stock_formatter()
 
-"""
+    # 基本信息部分
+    if sections.basic_info is not None:
+        parts = [_SECTION_HEADER.format(title="参考数据") + "## 公司信息\n\n### 基本信息\n",
+                 formatter.format_basic_info(sections.basic_info, stock_identity) + "\n\n"]
+        _append_ai_section(parts, ai_reports, 'company', "🏢 AI公司分析")
+        _append_ai_section(parts, ai_reports, 'fundamental', "🤖 AI基本面分析")
+        yield 'basic_info', "".join(parts)
+    
+    # 行情走势部分
+    if sections.kline_info is not None:
+        parts = [_SECTION_HEADER.format(title="📈 行情走势"),
+                 formatter.format_kline_data(sections.kline_info) + "\n\n"]
+        _append_ai_section(parts, ai_reports, 'market', "🤖 AI行情分析")
+        yield 'kline_info', "".join(parts)
+    
+    # 新闻资讯部分
+    if sections.news_list is not None:
+        parts = [_SECTION_HEADER.format(title="📰 新闻资讯"),
+                 formatter.format_stock_news_data(sections.news_list, has_content=False) + "\n\n"]
+        _append_ai_section(parts, ai_reports, 'news', "🤖 AI新闻分析")
+        yield 'news_data', "".join(parts)
+    
+    # 筹码分析部分（仅A股）
+    if sections.chip_data is not None:
+        parts = [_SECTION_HEADER.format(title="🧮 筹码分析"),
+                 formatter.format_chip_data(sections.chip_data) + "\n\n\n"]
+        _append_ai_section(parts, ai_reports, 'chip', "🤖 AI筹码分析")
+        yield 'chip_data', "".join(parts)
         
-    md_content += """---
+    yield 'footer', _REPORT_FOOTER
 
-*本报告由XYStock股票分析系统自动生成，仅供参考，不构成任何投资建议*
-"""
-    
-    return md_content
+
+def generate_markdown_report(stock_identity: Dict[str, Any], report_data: Dict[str, Any]) -> str:
+    """生成Markdown格式报告"""
+    return "".join(section_md for _, section_md in iter_markdown_sections(stock_identity, report_data))
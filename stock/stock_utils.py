@@ -1,8 +1,48 @@
+import copy
+import threading
 import akshare as ak
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
-from datetime import datetime
-from typing import Dict
+from collections import OrderedDict
+from dataclasses import fields
+from operator import attrgetter
+from typing import Dict, List
 from stockstats import wrap
+from utils.kline_cache import KLineData
+from utils.format_utils import now_str
+
+try:
+    import talib
+    TALIB_AVAILABLE = True
+except ImportError:
+    TALIB_AVAILABLE = False
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# K线图使用的均线周期
+MA_WINDOWS = (5, 10, 20)
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _rolling_means(close, windows):
+        """单次遍历收盘价，用滑动求和同时计算多条均线，窗口未满的位置为NaN"""
+        n = close.shape[0]
+        out = np.full((windows.shape[0], n), np.nan)
+        sums = np.zeros(windows.shape[0])
+        for i in range(n):
+            for j in range(windows.shape[0]):
+                window = windows[j]
+                sums[j] += close[i]
+                if i >= window:
+                    sums[j] -= close[i - window]
+                if i >= window - 1:
+                    out[j, i] = sums[j] / window
+        return out
 
 def get_chip_analysis_data(stock_code):
     """获取股票筹码分析数据"""
@@ -31,7 +71,7 @@ def get_chip_analysis_data(stock_code):
             # 保存原始数据到专用缓存
             cyq_data_for_cache = cyq_data.copy()
             cyq_data_for_cache['日期'] = cyq_data_for_cache['日期'].astype(str)
-            chip_cache.save_raw_data(stock_code, cyq_data_for_cache.to_dict('records'))
+            chip_cache.save_raw_data(stock_code, cyq_data_for_cache.to_dict('list'))
         
         latest = cyq_data.iloc[-1]
         profit_ratio = latest['获利比例']
@@ -68,46 +108,225 @@ def get_chip_analysis_data(stock_code):
         print(f"获取筹码数据失败: {str(e)}")
         return {"error": f"该股票暂不支持获取筹码数据"}
 
+def _classify_ma_trend(current_price, ma5, ma10, ma20) -> str:
+    """根据收盘价与均线的排列关系判断趋势"""
+    if current_price > ma5 > ma10 > ma20:
+        return "多头排列"
+    elif current_price < ma5 < ma10 < ma20:
+        return "空头排列"
+    else:
+        return "震荡整理"
+
+def _classify_macd_trend(macd, macd_signal, macd_hist) -> str:
+    """根据MACD、信号线和柱状图判断趋势"""
+    if macd > macd_signal and macd_hist > 0:
+        return "金叉向上"
+    elif macd < macd_signal and macd_hist < 0:
+        return "死叉向下"
+    else:
+        return "震荡调整"
+
 def _judge_ma_trend(stock_data) -> str:
     """判断移动平均线趋势"""
     try:
-        ma5 = stock_data['close_5_sma'].iloc[-1]
-        ma10 = stock_data['close_10_sma'].iloc[-1]
-        ma20 = stock_data['close_20_sma'].iloc[-1]
-        current_price = stock_data['close'].iloc[-1]
-        
-        if current_price > ma5 > ma10 > ma20:
-            return "多头排列"
-        elif current_price < ma5 < ma10 < ma20:
-            return "空头排列"
-        else:
-            return "震荡整理"
+        return _classify_ma_trend(
+            stock_data['close'].iloc[-1],
+            stock_data['close_5_sma'].iloc[-1],
+            stock_data['close_10_sma'].iloc[-1],
+            stock_data['close_20_sma'].iloc[-1],
+        )
     except:
         return "无法判断"
 
 def _judge_macd_trend(stock_data) -> str:
     """判断MACD趋势"""
     try:
-        macd = stock_data['macd'].iloc[-1]
-        macd_signal = stock_data['macds'].iloc[-1]
-        macd_hist = stock_data['macdh'].iloc[-1]
-        
-        if macd > macd_signal and macd_hist > 0:
-            return "金叉向上"
-        elif macd < macd_signal and macd_hist < 0:
-            return "死叉向下"
-        else:
-            return "震荡调整"
+        return _classify_macd_trend(
+            stock_data['macd'].iloc[-1],
+            stock_data['macds'].iloc[-1],
+            stock_data['macdh'].iloc[-1],
+        )
     except:
         return "无法判断"
     
 
+def sort_kline_data(kline_data: List) -> List:
+    """确保K线数据按时间升序排列（原地排序）
+    
+    数据源和缓存返回的K线通常已按时间排序，先做一次线性检查，仅在乱序时才排序，
+    避免构建DataFrame后再调用sort_values产生整表拷贝
+    """
+    if any(prev.datetime > curr.datetime for prev, curr in zip(kline_data, kline_data[1:])):
+        kline_data.sort(key=attrgetter('datetime'))
+    return kline_data
+
+_KLINE_FIELDS = tuple(field.name for field in fields(KLineData))
+_kline_row_getter = attrgetter(*_KLINE_FIELDS)
+# 价格字段类型固定为float，直接转为float64数组，省去pandas逐元素推断类型
+_KLINE_FLOAT_FIELDS = frozenset(('open', 'high', 'low', 'close'))
+
+def kline_to_dataframe(kline_data: List[KLineData]) -> pd.DataFrame:
+    """将K线列表转换为按时间升序的DataFrame
+    
+    用attrgetter一次取出每根K线的字段再按列转置，直接按列构建DataFrame，不生成逐行字典
+    """
+    columns = list(zip(*map(_kline_row_getter, sort_kline_data(kline_data))))
+    if not columns:
+        return pd.DataFrame(columns=list(_KLINE_FIELDS))
+    return pd.DataFrame({
+        name: np.array(values, dtype=np.float64) if name in _KLINE_FLOAT_FIELDS else values
+        for name, values in zip(_KLINE_FIELDS, columns)
+    }, copy=False)
+
+def add_moving_averages(df: pd.DataFrame) -> pd.DataFrame:
+    """为K线DataFrame添加MA5/MA10/MA20列
+    
+    收盘价无缺失时：安装了numba则一次遍历算出全部均线，否则用一次前缀和相减得到各窗口均值；
+    有缺失值时使用pandas rolling，保持其缺失值处理语义
+    """
+    close = df['close'].to_numpy(dtype=np.float64)
+    # 数据长度不足一个窗口的均线全部为NaN，不参与计算（先按顺序建好全部均线列，保持列顺序不变）
+    windows = tuple(window for window in MA_WINDOWS if len(close) >= window)
+    if len(windows) < len(MA_WINDOWS):
+        for window in MA_WINDOWS:
+            df[f'MA{window}'] = np.nan
+        if not windows:
+            return df
+    
+    has_nan = np.isnan(close).any()
+    if NUMBA_AVAILABLE and not has_nan:
+        for window, values in zip(windows, _rolling_means(close, np.array(windows, dtype=np.int64))):
+            df[f'MA{window}'] = values
+    elif not has_nan:
+        cumsum = np.concatenate(([0.0], np.cumsum(close)))
+        for window in windows:
+            values = np.full(len(close), np.nan)
+            values[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+            df[f'MA{window}'] = values
+    else:
+        for window in windows:
+            df[f'MA{window}'] = df['close'].rolling(window=window).mean()
+    return df
+
+def dataframe_to_records(df: pd.DataFrame) -> List[Dict]:
+    """DataFrame转为逐行字典列表，与df.to_dict('records')结果一致
+    
+    先把每列整体转为Python列表再按行拼装，比pandas逐行装箱的实现快
+    """
+    columns = list(df.columns)
+    return [dict(zip(columns, row)) for row in zip(*(df[col].tolist() for col in columns))]
+
+def dataframe_to_columns(df: pd.DataFrame) -> Dict[str, list]:
+    """DataFrame转为按列存储的字典 {列名: 值列表}，不创建逐行字典，可直接用pd.DataFrame()还原"""
+    return {col: df[col].tolist() for col in df.columns}
+
+def _get_talib_indicators(close: np.ndarray) -> Dict:
+    """使用TA-Lib计算均线、MACD、RSI和布林带（C实现，避免pandas滚动计算的开销）
+    
+    与stockstats的口径差异：布林带标准差按样本标准差（ddof=1）换算，与stockstats一致；
+    EMA/MACD/RSI在TA-Lib中以前N根的简单平均作为初值，stockstats从第一根K线开始指数平滑，
+    两者差异随K线数量按指数衰减，默认160根K线时可忽略
+    """
+    close_len = len(close)
+    
+    def last(values, min_len):
+        return float(values[-1]) if close_len > min_len else None
+    
+    ma_5, ma_10, ma_20 = talib.SMA(close, 5), talib.SMA(close, 10), talib.SMA(close, 20)
+    # TA-Lib的MACD信号线需要 26 + 9 - 1 = 33 根K线之后才有值
+    macd, macd_signal, macd_hist = talib.MACD(close, 12, 26, 9)
+    # TA-Lib的STDDEV为总体标准差，乘以sqrt(n/(n-1))换算为样本标准差
+    boll_std = talib.STDDEV(close, 20, 1) * np.sqrt(20 / 19)
+    boll_middle = ma_20
+    boll_upper, boll_lower = boll_middle + 2 * boll_std, boll_middle - 2 * boll_std
+    
+    indicators = {
+        'ma_5': last(ma_5, 5),
+        'ma_10': last(ma_10, 10),
+        'ma_20': last(ma_20, 20),
+        'ma_60': last(talib.SMA(close, 60), 60),
+        'ema_12': last(talib.EMA(close, 12), 12),
+        'ema_26': last(talib.EMA(close, 26), 26),
+        'macd': last(macd, 33),
+        'macd_signal': last(macd_signal, 33),
+        'macd_histogram': last(macd_hist, 33),
+        'rsi_14': last(talib.RSI(close, 14), 14),
+        'boll_upper': last(boll_upper, 20),
+        'boll_middle': last(boll_middle, 20),
+        'boll_lower': last(boll_lower, 20),
+    }
+    
+    try:
+        indicators['ma_trend'] = _classify_ma_trend(close[-1], ma_5[-1], ma_10[-1], ma_20[-1])
+        indicators['macd_trend'] = _classify_macd_trend(macd[-1], macd_signal[-1], macd_hist[-1])
+    except Exception:
+        indicators['ma_trend'] = "无法判断"
+        indicators['macd_trend'] = "无法判断"
+    
+    return indicators
+
+def _calc_kdj(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 9):
+    """计算KDJ（与stockstats口径一致：RSV窗口不足时按已有数据计算，K/D按1/3权重平滑，初值50）"""
+    high_max = sliding_window_view(np.pad(high, (window - 1, 0), mode='edge'), window).max(axis=1)
+    low_min = sliding_window_view(np.pad(low, (window - 1, 0), mode='edge'), window).min(axis=1)
+    spread = high_max - low_min
+    rsv = np.divide(close - low_min, spread, out=np.zeros_like(close), where=spread != 0) * 100
+    
+    k = d = 50.0
+    for value in rsv:
+        k = k * 2 / 3 + value / 3
+        d = d * 2 / 3 + k / 3
+    return k, d, 3 * k - 2 * d
+
+def get_indicators_from_arrays(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> Dict:
+    """基于最高价、最低价、收盘价的float64数组计算技术指标（需要TA-Lib）"""
+    close_len = len(close)
+    kdj_k, kdj_d, kdj_j = _calc_kdj(high, low, close) if close_len > 9 else (None, None, None)
+    
+    indicators = {
+        # KDJ指标
+        'kdj_k': kdj_k,
+        'kdj_d': kdj_d,
+        'kdj_j': kdj_j,
+        
+        # 威廉指标
+        'wr_14': float(talib.WILLR(high, low, close, 14)[-1]) if close_len > 14 else None,
+        
+        # CCI指标
+        'cci_14': float(talib.CCI(high, low, close, 14)[-1]) if close_len > 14 else None,
+    }
+    indicators.update(_get_talib_indicators(close))
+    return indicators
+
 def get_indicators(df):
-    """使用stockstats计算技术指标"""
+    """计算技术指标
+    
+    安装了TA-Lib时，先把高、低、收三列转成numpy数组再计算，全程不经过stockstats；否则使用stockstats
+    """
+    if TALIB_AVAILABLE:
+        return get_indicators_from_arrays(
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64),
+            df['close'].to_numpy(dtype=np.float64),
+        )
+    
     stock = wrap(df)
     stock_len = len(stock)
     
     indicators = {
+        # KDJ指标
+        'kdj_k': stock['kdjk'].iloc[-1] if stock_len > 9 else None,
+        'kdj_d': stock['kdjd'].iloc[-1] if stock_len > 9 else None,
+        'kdj_j': stock['kdjj'].iloc[-1] if stock_len > 9 else None,
+        
+        # 威廉指标
+        'wr_14': stock['wr_14'].iloc[-1] if stock_len > 14 else None,
+        
+        # CCI指标
+        'cci_14': stock['cci_14'].iloc[-1] if stock_len > 14 else None,
+    }
+    
+    indicators.update({
         # 移动平均线
         'ma_5': stock['close_5_sma'].iloc[-1] if stock_len > 5 else None,
         'ma_10': stock['close_10_sma'].iloc[-1] if stock_len > 10 else None,
@@ -123,11 +342,6 @@ def get_indicators(df):
         'macd_signal': stock['macds'].iloc[-1] if stock_len > 26 else None,
         'macd_histogram': stock['macdh'].iloc[-1] if stock_len > 26 else None,
         
-        # KDJ指标
-        'kdj_k': stock['kdjk'].iloc[-1] if stock_len > 9 else None,
-        'kdj_d': stock['kdjd'].iloc[-1] if stock_len > 9 else None,
-        'kdj_j': stock['kdjj'].iloc[-1] if stock_len > 9 else None,
-        
         # RSI指标
         'rsi_14': stock['rsi_14'].iloc[-1] if stock_len > 14 else None,
         
@@ -136,16 +350,10 @@ def get_indicators(df):
         'boll_middle': stock['boll'].iloc[-1] if stock_len > 20 else None,
         'boll_lower': stock['boll_lb'].iloc[-1] if stock_len > 20 else None,
         
-        # 威廉指标
-        'wr_14': stock['wr_14'].iloc[-1] if stock_len > 14 else None,
-        
-        # CCI指标
-        'cci_14': stock['cci_14'].iloc[-1] if stock_len > 14 else None,
-                
         # 趋势判断
         'ma_trend': _judge_ma_trend(stock),
         'macd_trend': _judge_macd_trend(stock),
-    }
+    })
     
     return indicators
 
@@ -182,14 +390,54 @@ def fetch_stock_basic_info(stock_code: str) -> Dict:
     except Exception as e:
         basic_info['error'] = str(e)
     
-    basic_info['update_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    basic_info['update_time'] = now_str()
     return basic_info
 
-def fetch_stock_technical_indicators(stock_code: str, period: int = 160) -> Dict:
-    """获取股票技术指标的具体实现（K线数据不缓存，只缓存计算结果）"""
-    from stock.stock_data_fetcher import data_manager, KLineType
+# 技术指标和风险指标计算结果的进程内LRU缓存，键为 (股票代码, K线周期, 最新K线时间, 最新收盘价)
+# 最新K线时间随窗口滑动而变化；盘中最新K线时间不变但收盘价仍在变，因此一并纳入键中
+_CALC_CACHE_SIZE = 64
+_calc_cache_lock = threading.Lock()
+_risk_summary_cache: OrderedDict = OrderedDict()
+_indicators_cache: OrderedDict = OrderedDict()
+
+def _calc_cache_key(stock_code: str, period: int, df: pd.DataFrame) -> tuple:
+    """根据最新一根K线生成计算结果缓存的键"""
+    return (stock_code, period, str(df['datetime'].iloc[-1]), float(df['close'].iloc[-1]))
+
+def _get_calc_cached(cache: OrderedDict, key: tuple, compute) -> Dict:
+    """从计算结果缓存中取值，未命中时调用compute计算并写入；返回副本，调用方修改不会影响缓存"""
+    with _calc_cache_lock:
+        result = cache.get(key)
+        if result is not None:
+            cache.move_to_end(key)
+    if result is None:
+        result = compute()
+        with _calc_cache_lock:
+            cache[key] = result
+            cache.move_to_end(key)
+            while len(cache) > _CALC_CACHE_SIZE:
+                cache.popitem(last=False)
+    return copy.deepcopy(result)
+
+def _get_risk_summary(stock_code: str, df: pd.DataFrame, period: int) -> Dict:
+    """计算风险指标摘要，相同K线数据直接复用上次的计算结果"""
     from utils.risk_metrics import calculate_portfolio_risk_summary
     
+    return _get_calc_cached(_risk_summary_cache, _calc_cache_key(stock_code, period, df),
+                            lambda: calculate_portfolio_risk_summary(df, price_col='close'))
+
+def _get_indicators_cached(stock_code: str, df: pd.DataFrame, period: int) -> Dict:
+    """计算技术指标，相同K线数据直接复用上次的计算结果（不写入磁盘缓存的调用也能命中）"""
+    return _get_calc_cached(_indicators_cache, _calc_cache_key(stock_code, period, df),
+                            lambda: get_indicators(df))
+
+def fetch_stock_technical_indicators(stock_code: str, period: int = 160, compute_risk: bool = True) -> Dict:
+    """获取股票技术指标的具体实现（K线数据不缓存，只缓存计算结果）
+    
+    compute_risk为False时跳过风险指标计算，返回的risk_metrics为空字典
+    """
+    from stock.stock_data_fetcher import data_manager, KLineType
+    
     indicators_info = {}
     
     try:
@@ -198,19 +446,18 @@ def fetch_stock_technical_indicators(stock_code: str, period: int = 160) -> Dict
         if not kline_data:
             indicators_info['error'] = f"未获取到股票 {stock_code} 的K线数据"
         else:
-            df = pd.DataFrame([k.__dict__ for k in kline_data]).sort_values('datetime')
+            df = kline_to_dataframe(kline_data)
             
             # 计算移动平均线
-            for period in [5, 10, 20]:
-                df[f'MA{period}'] = df['close'].rolling(window=period).mean()
+            add_moving_averages(df)
             
-            indicators = get_indicators(df)
+            indicators = _get_indicators_cached(stock_code, df, period)
             
             # 风险指标计算
             risk_metrics = {}
-            if len(df) >= 5:
+            if compute_risk and len(df) >= 5:
                 try:
-                    risk_metrics = calculate_portfolio_risk_summary(df, price_col='close')                            
+                    risk_metrics = _get_risk_summary(stock_code, df, period)
                 except Exception as e:
                     risk_metrics['error'] = str(e)
 
@@ -236,7 +483,7 @@ def fetch_stock_technical_indicators(stock_code: str, period: int = 160) -> Dict
     except Exception as e:
         indicators_info['error'] = str(e)
     
-    indicators_info['update_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    indicators_info['update_time'] = now_str()
     return indicators_info
 
 def fetch_stock_news_data(stock_code: str, day=7) -> Dict:
@@ -261,7 +508,7 @@ def fetch_stock_news_data(stock_code: str, day=7) -> Dict:
     except Exception as e:
         news_info['error'] = str(e)
     
-    news_info['update_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    news_info['update_time'] = now_str()
     return news_info
 
 def fetch_stock_chip_data(stock_code: str) -> Dict:
@@ -274,11 +521,11 @@ def fetch_stock_chip_data(stock_code: str) -> Dict:
     except Exception as e:
         chip_info['error'] = str(e)
     
-    chip_info['update_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    chip_info['update_time'] = now_str()
     return chip_info
 
 def get_chip_raw_data(stock_code):
-    """获取股票筹码原始数据"""
+    """获取股票筹码原始数据（按列存储的 {列名: 值列表}，旧缓存可能为逐行记录列表，均可直接构建DataFrame）"""
     try:
         from stock.chip_data_cache import get_chip_cache_manager
         chip_cache = get_chip_cache_manager()
@@ -299,7 +546,7 @@ def get_chip_raw_data(stock_code):
             # 保存原始数据到专用缓存
             cyq_data_for_cache = cyq_data.copy()
             cyq_data_for_cache['日期'] = cyq_data_for_cache['日期'].astype(str)
-            raw_data = cyq_data_for_cache.to_dict('records')
+            raw_data = cyq_data_for_cache.to_dict('list')
             chip_cache.save_raw_data(stock_code, raw_data)
             
             return raw_data
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+ETF持仓数据测试：持仓集中度分级边界
+"""
+import sys
+import os
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+pytest.importorskip("pandas")
+pytest.importorskip("akshare")
+
+from stock.etf_holdings_fetcher import ETFHoldingsFetcher
+
+
+@pytest.mark.parametrize("top_10_weight, expected", [
+    (10, "低"),
+    (30, "低"),
+    (30.01, "中"),
+    (50, "中"),
+    (50.01, "高"),
+    (90, "高"),
+])
+def test_concentration_level_boundaries(top_10_weight, expected):
+    """超过边界才升一级（>），与分级改为二分查找之前的if链一致"""
+    holdings = [{'占净值比例': top_10_weight}]
+    analysis = ETFHoldingsFetcher()._analyze_concentration(holdings)
+    assert analysis['concentration_level'] == expected
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+格式化工具测试：RSI分级边界
+"""
+import sys
+import os
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.format_utils import judge_rsi_level
+
+
+@pytest.mark.parametrize("rsi, expected", [
+    (0, "超卖"),
+    (19.99, "超卖"),
+    (20, "弱势"),
+    (29.99, "弱势"),
+    (30, "正常"),
+    (69.99, "正常"),
+    (70, "强势"),
+    (79.99, "强势"),
+    (80, "超买"),
+    (100, "超买"),
+    (float('nan'), "超卖"),
+])
+def test_judge_rsi_level_boundaries(rsi, expected):
+    """边界值归入较高一级（>=），与分级改为二分查找之前的if链一致"""
+    assert judge_rsi_level(rsi) == expected
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+股票数据缓存测试：按键存储的条目读写与旧版缓存迁移、过期判断、已解析条目的内存缓存、未变化跳过写入、非交易时段过期时间
+"""
+import sys
+import os
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# stock包的__init__会导入数据获取模块
+pytest.importorskip("pandas")
+pytest.importorskip("akshare")
+
+from stock import stock_data_cache
+from stock.stock_data_cache import StockDataCache, ARROW_FRAME_KEY
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return StockDataCache(cache_dir=str(tmp_path))
+
+
+@pytest.fixture
+def fixed_expire(cache, monkeypatch):
+    """固定写入时的过期时间，避免非交易时段的过期时间随当前时间变化"""
+    monkeypatch.setattr(cache, '_get_write_expire_minutes', lambda data_type, analysis_type, now: 60)
+
+
+def count_writes(cache, monkeypatch):
+    """统计实际写入条目文件的次数"""
+    writes = []
+    write_entry_file = cache._write_entry_file
+
+    def counting_write(path, safe_entry):
+        writes.append(path)
+        write_entry_file(path, safe_entry)
+
+    monkeypatch.setattr(cache, '_write_entry_file', counting_write)
+    return writes
+
+
+def test_entry_round_trip(cache):
+    data = {'title': '新闻', 'items': [1, 2.5, None], 'nested': {'a': True}}
+    cache.save_cached_data('news_data', '600519', data)
+
+    assert cache.is_cache_valid('news_data', '600519')
+    assert cache.get_cached_data('news_data', '600519') == data
+    assert not cache.is_cache_valid('news_data', '000001')
+    assert 'news_data_600519' in cache.list_cache_keys()
+
+    assert cache.delete_entry('news_data_600519')
+    assert not cache.is_cache_valid('news_data', '600519')
+    assert not cache.delete_entry('news_data_600519')
+
+
+def test_ai_analysis_round_trip(cache):
+    cache.save_cached_data('ai_analysis', '600519', {'report': '分析'}, analysis_type='news')
+
+    assert cache.get_cached_data('ai_analysis', '600519', 'news') == {'report': '分析'}
+    assert not cache.is_cache_valid('ai_analysis', '600519', 'chip')
+
+
+def test_legacy_cache_migration(tmp_path):
+    legacy_file = tmp_path / "stock_data.json"
+    legacy_file.write_text(json.dumps({
+        'news_data_600519': {
+            'cache_meta': {'timestamp': datetime.now().isoformat(), 'data_type': 'news_data'},
+            'data': {'title': '旧缓存'},
+        },
+    }), encoding='utf-8')
+
+    cache = StockDataCache(cache_dir=str(tmp_path))
+
+    assert not legacy_file.exists()
+    # 旧条目没有expires_at，按写入时间和配置的过期时间判断
+    assert cache.is_cache_valid('news_data', '600519')
+    assert cache.get_cached_data('news_data', '600519') == {'title': '旧缓存'}
+
+
+def test_entry_memo_reuses_parsed_entry(cache):
+    cache.save_cached_data('news_data', '600519', {'title': '新闻'})
+    entry = cache.load_entry('news_data_600519')
+
+    # 文件未变化时返回内存中已解析的同一对象
+    assert cache.load_entry('news_data_600519') is entry
+
+    cache.save_cached_data('news_data', '600519', {'title': '更新'})
+    assert cache.load_entry('news_data_600519')['data'] == {'title': '更新'}
+
+
+def test_entry_memo_is_bounded(cache, monkeypatch):
+    monkeypatch.setattr(stock_data_cache, 'ENTRY_MEMO_SIZE', 2)
+    for code in ('000001', '000002', '000003'):
+        cache.save_cached_data('news_data', code, {'title': code})
+        cache.load_entry(f'news_data_{code}')
+
+    assert list(cache._entry_memo) == ['news_data_000002', 'news_data_000003']
+
+
+def test_unchanged_entry_skips_write(cache, fixed_expire, monkeypatch):
+    writes = count_writes(cache, monkeypatch)
+
+    cache.save_cached_data('basic_info', '600519', {'current_price': 10.0, 'update_time': '10:00:00'})
+    assert len(writes) == 1
+
+    # 只有刷新时间变化，跳过写入
+    cache.save_cached_data('basic_info', '600519', {'current_price': 10.0, 'update_time': '10:00:05'})
+    assert len(writes) == 1
+
+    cache.save_cached_data('basic_info', '600519', {'current_price': 10.5, 'update_time': '10:00:10'})
+    assert len(writes) == 2
+
+    # 不检查时直接覆盖
+    cache.save_cached_data('basic_info', '600519', {'current_price': 10.5, 'update_time': '10:00:15'},
+                           check_unchanged=False)
+    assert len(writes) == 3
+
+
+def test_unchanged_but_expired_entry_is_rewritten(cache, fixed_expire, monkeypatch):
+    cache.put_entry('news_data_600519', {
+        'cache_meta': {'timestamp': datetime.now().isoformat(), 'expires_at': time.time() - 1,
+                       'data_type': 'news_data', 'stock_code': '600519', 'analysis_type': None,
+                       'expire_minutes': 60},
+        'data': {'title': '新闻'},
+    })
+    writes = count_writes(cache, monkeypatch)
+
+    cache.save_cached_data('news_data', '600519', {'title': '新闻'})
+
+    assert len(writes) == 1
+    assert cache.is_cache_valid('news_data', '600519')
+    assert cache.get_cached_data('news_data', '600519') == {'title': '新闻'}
+
+
+def test_upsert_skips_unchanged_check(cache, monkeypatch):
+    entry = {'cache_meta': {'timestamp': datetime.now().isoformat(), 'expires_at': time.time() + 60,
+                            'data_type': 'news_data'},
+             'data': {'title': '新闻'}}
+    cache.put_entry('news_data_600519', entry)
+    writes = count_writes(cache, monkeypatch)
+    monkeypatch.setattr(cache, '_is_unchanged', lambda *args: pytest.fail("upsert不应读取旧条目"))
+
+    cache.upsert('news_data_600519', entry)
+
+    assert len(writes) == 1
+
+
+def test_expired_entry_is_miss(cache):
+    cache.put_entry('news_data_600519', {
+        'cache_meta': {'timestamp': datetime.now().isoformat(), 'expires_at': time.time() - 1,
+                       'data_type': 'news_data'},
+        'data': {'title': '过期'},
+    })
+    assert cache.get_valid_cached_data('news_data', '600519') is None
+    # 过期数据仍可作为拉取失败时的回退
+    assert cache.get_cached_data('news_data', '600519') == {'title': '过期'}
+
+
+def test_legacy_meta_expiry_does_not_mutate(cache):
+    fresh_meta = {'timestamp': datetime.now().isoformat()}
+    stale_meta = {'timestamp': (datetime.now() - timedelta(hours=2)).isoformat()}
+
+    assert cache.is_meta_valid('news_data', fresh_meta)
+    assert not cache.is_meta_valid('news_data', stale_meta)
+    assert 'expires_at' not in fresh_meta and 'expires_at' not in stale_meta
+
+
+@pytest.mark.parametrize("data_type, now, expected", [
+    # 交易时段内使用常规过期时间
+    ('basic_info', datetime(2024, 1, 8, 10, 0), 5),
+    # 开盘前最多缓存到开盘
+    ('basic_info', datetime(2024, 1, 8, 8, 0), 75),
+    # 午间休市到下午开盘
+    ('basic_info', datetime(2024, 1, 8, 12, 30), 30),
+    # 周末受off_session_expire_minutes限制
+    ('basic_info', datetime(2024, 1, 6, 10, 0), 24 * 60),
+    ('news_data', datetime(2024, 1, 8, 20, 0), 180),
+    # 非交易时段的延长不会短于常规过期时间
+    ('news_data', datetime(2024, 1, 8, 9, 0), 60),
+    # 没有配置off_session_expire_minutes的类型不受影响
+    ('technical_indicators', datetime(2024, 1, 6, 10, 0), 30),
+])
+def test_off_session_expire_minutes(cache, data_type, now, expected):
+    assert cache._get_write_expire_minutes(data_type, None, now) == expected
+
+
+def test_undecodable_arrow_frame_is_miss(cache):
+    cache.save_cached_data('technical_indicators', '600519', {'frame': {ARROW_FRAME_KEY: 'not-arrow'}})
+    assert cache.get_valid_cached_data('technical_indicators', '600519') is None
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+股票数据工具测试：并发拉取合并、综合分析的单飞生成、拉取失败的短时记忆
+"""
+import sys
+import os
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("akshare")
+pytest.importorskip("stockstats")
+
+from stock import stock_data_tools
+from stock.stock_data_cache import StockDataCache
+from stock.stock_data_tools import StockTools, _cached_fetch
+
+
+class FakeStockTools(StockTools):
+    """用假拉取方法替代网络请求的StockTools"""
+
+    def __init__(self, results):
+        super().__init__()
+        self.results = results
+        self.calls = []
+
+    @_cached_fetch('news_data', "❌ 获取新闻失败")
+    def fetch_fake(self, stock_code):
+        self.calls.append(stock_code)
+        return dict(self.results[stock_code])
+
+
+@pytest.fixture
+def make_tools(tmp_path, monkeypatch):
+    cache_manager = StockDataCache(cache_dir=str(tmp_path))
+    monkeypatch.setattr(stock_data_tools, 'get_cache_manager', lambda: cache_manager)
+    return FakeStockTools
+
+
+def test_singleflight_runs_once_for_concurrent_callers(make_tools):
+    tools = make_tools({})
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'value': 1}
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        owner = executor.submit(tools._run_singleflight, ('key',), slow_fetch)
+        assert started.wait(5)
+        waiters = [executor.submit(tools._run_singleflight, ('key',), slow_fetch) for _ in range(3)]
+        # 留出时间让等待者进入等待，再放行第一次拉取
+        time.sleep(0.2)
+        release.set()
+        results = [owner.result()] + [future.result() for future in waiters]
+
+    assert len(calls) == 1
+    assert all(result == {'value': 1} for result in results)
+    # 等待者拿到的是副本，互相修改不影响
+    assert len({id(result) for result in results}) == len(results)
+    assert not tools._inflight
+
+
+def test_singleflight_propagates_errors(make_tools):
+    tools = make_tools({})
+
+    def failing_fetch():
+        raise RuntimeError("network down")
+
+    with pytest.raises(RuntimeError):
+        tools._run_singleflight(('key',), failing_fetch)
+    assert not tools._inflight
+
+
+@pytest.fixture
+def fake_comprehensive(monkeypatch):
+    """用假的综合分析生成函数替代AI调用，返回调用记录和放行事件"""
+    calls = []
+    release = threading.Event()
+    release.set()
+
+    def generate_comprehensive_analysis_report(stock_identity, user_opinion, **kwargs):
+        calls.append(user_opinion)
+        release.wait(5)
+        return types.SimpleNamespace(success=True, report=f"综合分析{len(calls)}", data_sources=[])
+
+    monkeypatch.setattr(stock_data_tools, 'AI_ANALYSIS_AVAILABLE', True)
+    monkeypatch.setitem(sys.modules, 'stock.stock_ai_analysis', types.SimpleNamespace(
+        generate_comprehensive_analysis_report=generate_comprehensive_analysis_report))
+    monkeypatch.setitem(sys.modules, 'market.market_data_tools', types.SimpleNamespace(
+        get_market_tools=lambda: None))
+    return calls, release
+
+
+def test_comprehensive_analysis_generated_once_for_concurrent_callers(make_tools, fake_comprehensive, monkeypatch):
+    calls, release = fake_comprehensive
+    release.clear()
+    tools = make_tools({})
+    stock_identity = {'code': '600519', 'name': '贵州茅台'}
+    # 记录写入缓存时单飞是否仍在进行，写入完成前到达的请求不会再次生成
+    written_in_flight = []
+    upsert = tools.cache_manager.upsert
+
+    def recording_upsert(cache_key, entry):
+        written_in_flight.append(bool(tools._inflight))
+        upsert(cache_key, entry)
+
+    monkeypatch.setattr(tools.cache_manager, 'upsert', recording_upsert)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(tools.get_comprehensive_ai_analysis, stock_identity) for _ in range(3)]
+        # 留出时间让其余请求进入等待，再放行生成
+        time.sleep(0.2)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert calls == ['']
+    assert written_in_flight == [True]
+    assert all(result['report'] == '综合分析1' for result in results)
+    # 生成结果已在单飞内写入缓存，之后的请求直接读取
+    assert tools.get_comprehensive_ai_analysis(stock_identity)['report'] == '综合分析1'
+    assert calls == ['']
+
+
+def test_comprehensive_analysis_regenerated_when_opinion_changes(make_tools, fake_comprehensive):
+    calls, _ = fake_comprehensive
+    tools = make_tools({})
+    stock_identity = {'code': '600519', 'name': '贵州茅台'}
+
+    tools.get_comprehensive_ai_analysis(stock_identity, user_opinion='看好')
+    assert tools.get_comprehensive_ai_analysis(stock_identity, user_opinion='看好')['report'] == '综合分析1'
+    assert tools.get_comprehensive_ai_analysis(stock_identity, user_opinion='看空')['report'] == '综合分析2'
+    assert calls == ['看好', '看空']
+
+
+def test_failed_fetch_is_remembered(make_tools):
+    tools = make_tools({'999999': {'error': '无效代码'}})
+
+    assert tools.fetch_fake('999999') == {'error': '无效代码'}
+    assert tools.fetch_fake('999999') == {'error': '无效代码'}
+    assert tools.calls == ['999999']
+
+    # 强制刷新时忽略失败记录
+    tools.fetch_fake('999999', force_refresh=True)
+    assert tools.calls == ['999999', '999999']
+
+
+def test_failed_fetch_expires(make_tools, monkeypatch):
+    monkeypatch.setattr(stock_data_tools, 'FAILED_FETCH_TTL_SECONDS', 0)
+    tools = make_tools({'999999': {'error': '无效代码'}})
+
+    tools.fetch_fake('999999')
+    tools.fetch_fake('999999')
+
+    assert tools.calls == ['999999', '999999']
+
+
+def test_success_clears_failure(make_tools):
+    tools = make_tools({'600519': {'error': '超时'}})
+    tools.fetch_fake('600519')
+    assert tools._failed_fetches
+
+    tools.results['600519'] = {'title': '新闻'}
+    assert tools.fetch_fake('600519', force_refresh=True) == {'title': '新闻'}
+    assert not tools._failed_fetches
+    # 成功结果已写入缓存
+    assert tools.fetch_fake('600519') == {'title': '新闻'}
+    assert len(tools.calls) == 2
+
+
+def test_failed_fetches_are_bounded(make_tools, monkeypatch):
+    monkeypatch.setattr(stock_data_tools, 'FAILED_FETCH_CACHE_SIZE', 2)
+    codes = ['000001', '000002', '000003']
+    tools = make_tools({code: {'error': '无效代码'} for code in codes})
+
+    for code in codes:
+        tools.fetch_fake(code)
+
+    assert len(tools._failed_fetches) == 2
+    # 最早的失败记录被淘汰，再次请求会重新拉取
+    tools.fetch_fake('000001')
+    assert tools.calls == codes + ['000001']
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+技术指标计算测试：均线各计算路径、TA-Lib路径与stockstats路径的结果一致性
+"""
+import sys
+import os
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("akshare")
+pytest.importorskip("stockstats")
+
+from stock import stock_utils
+
+
+def make_kline_df(length: int = 160, seed: int = 7) -> "pd.DataFrame":
+    """生成确定性的随机游走K线数据"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    open_ = close * (1 + rng.normal(0, 0.005, length))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, length))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, length))
+    return pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=length, freq='D').strftime('%Y-%m-%d'),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': rng.integers(1000, 10000, length),
+    })
+
+
+def rolling_moving_averages(close):
+    """pandas rolling计算的均线，作为各路径的对照"""
+    return {f'MA{window}': close.rolling(window=window).mean().to_numpy() for window in stock_utils.MA_WINDOWS}
+
+
+@pytest.mark.parametrize("use_numba", [True, False])
+@pytest.mark.parametrize("length", [3, 7, 15, 160])
+def test_moving_averages_match_rolling(monkeypatch, use_numba, length):
+    """numba单次遍历与前缀和两种路径的均线应与pandas rolling一致，数据不足一个窗口时为NaN"""
+    if use_numba and not stock_utils.NUMBA_AVAILABLE:
+        pytest.skip("未安装numba")
+    monkeypatch.setattr(stock_utils, 'NUMBA_AVAILABLE', use_numba)
+    df = make_kline_df(length)
+    expected = rolling_moving_averages(df['close'])
+
+    stock_utils.add_moving_averages(df)
+
+    assert list(df.columns[-3:]) == ['MA5', 'MA10', 'MA20']
+    for column, values in expected.items():
+        np.testing.assert_allclose(df[column].to_numpy(), values, rtol=1e-9, equal_nan=True)
+
+
+def test_moving_averages_with_missing_close():
+    """收盘价有缺失时使用rolling路径，缺失值影响的窗口为NaN"""
+    df = make_kline_df(40)
+    df.loc[12, 'close'] = np.nan
+    expected = rolling_moving_averages(df['close'])
+
+    stock_utils.add_moving_averages(df)
+
+    for column, values in expected.items():
+        np.testing.assert_allclose(df[column].to_numpy(), values, rtol=1e-9, equal_nan=True)
+    assert np.isnan(df['MA5'].iloc[12:17]).all()
+    assert not np.isnan(df['MA5'].iloc[17])
+
+
+def stockstats_indicators(df):
+    """强制使用stockstats路径计算指标"""
+    talib_available = stock_utils.TALIB_AVAILABLE
+    stock_utils.TALIB_AVAILABLE = False
+    try:
+        return stock_utils.get_indicators(df.copy())
+    finally:
+        stock_utils.TALIB_AVAILABLE = talib_available
+
+
+def talib_indicators(df):
+    """直接使用TA-Lib路径计算指标"""
+    return stock_utils.get_indicators_from_arrays(
+        df['high'].to_numpy(dtype=np.float64),
+        df['low'].to_numpy(dtype=np.float64),
+        df['close'].to_numpy(dtype=np.float64),
+    )
+
+
+def test_talib_matches_stockstats():
+    """布林带和均线应与stockstats完全一致；EMA类指标初值不同，160根K线后差异可忽略"""
+    pytest.importorskip("talib")
+    df = make_kline_df()
+    expected = stockstats_indicators(df)
+    actual = talib_indicators(df)
+
+    for key in ('ma_5', 'ma_10', 'ma_20', 'ma_60', 'boll_upper', 'boll_middle', 'boll_lower'):
+        assert actual[key] == pytest.approx(expected[key], rel=1e-9), key
+    for key in ('ema_12', 'ema_26', 'macd', 'macd_signal', 'macd_histogram', 'rsi_14'):
+        assert actual[key] == pytest.approx(expected[key], abs=1e-2), key
+
+
+@pytest.mark.parametrize("length, has_macd", [(26, False), (27, True)])
+def test_stockstats_macd_requires_27_bars(length, has_macd):
+    """stockstats路径的MACD从第一根K线开始平滑，超过26根K线即返回"""
+    indicators = stockstats_indicators(make_kline_df(length))
+    for key in ('macd', 'macd_signal', 'macd_histogram'):
+        assert (indicators[key] is not None) == has_macd
+
+
+@pytest.mark.parametrize("length, has_macd", [(33, False), (34, True)])
+def test_talib_macd_requires_34_bars(length, has_macd):
+    """TA-Lib的MACD信号线在33根K线之后才有值，不足时返回None而不是NaN"""
+    pytest.importorskip("talib")
+    indicators = talib_indicators(make_kline_df(length))
+    for key in ('macd', 'macd_signal', 'macd_histogram'):
+        assert (indicators[key] is not None) == has_macd
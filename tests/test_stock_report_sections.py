@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+股票报告测试：报告各部分获取结果的短时缓存
+"""
+import sys
+import os
+from collections import OrderedDict
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# stock包的__init__会导入数据获取模块
+pytest.importorskip("pandas")
+pytest.importorskip("akshare")
+
+from stock import stock_report
+
+STOCK_IDENTITY = {'code': '600519', 'name': '贵州茅台', 'market_name': 'A股'}
+
+
+@pytest.fixture(autouse=True)
+def empty_section_cache(monkeypatch):
+    monkeypatch.setattr(stock_report, '_section_cache', OrderedDict())
+
+
+def make_fetch(result):
+    """返回固定结果并记录调用次数的获取函数"""
+    calls = []
+
+    def fetch(stock_identity, **kwargs):
+        calls.append(kwargs)
+        return result
+
+    return fetch, calls
+
+
+def fetch_twice(fetch):
+    for _ in range(2):
+        result = stock_report._fetch_section('basic_info', fetch, STOCK_IDENTITY, {'use_cache': True})
+    return result
+
+
+def test_successful_section_is_reused():
+    fetch, calls = make_fetch({'current_price': 10.0, 'ai_analysis': {'report': '分析'}})
+
+    assert fetch_twice(fetch) == {'current_price': 10.0, 'ai_analysis': {'report': '分析'}}
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("result", [
+    {'error': '网络错误'},
+    # 数据正常但附带的AI分析失败
+    {'current_price': 10.0, 'ai_analysis': {'error': 'AI服务不可用'}},
+    {'current_price': 10.0, 'ai_analysis': {'report': '分析'}, 'company_analysis': {'error': '超时'}},
+])
+def test_failed_section_is_not_cached(result):
+    fetch, calls = make_fetch(result)
+
+    assert fetch_twice(fetch) == result
+    assert len(calls) == 2
@@ -3,6 +3,7 @@ XY Stock 股票分析系统 - Streamlit Web界面
 """
 
 import streamlit as st
+import logging
 import sys
 import os
 from datetime import datetime
@@ -10,6 +11,14 @@ from datetime import datetime
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
+from config_manager import config
+
+# 配置日志：数据获取、缓存等模块通过logging输出运行信息，未配置时不会显示
+logging.basicConfig(
+    level=getattr(logging, config.get('LLM_LOGGING.LOG_LEVEL', 'INFO')),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
 from ui.config import MARKET_TYPES, STOCK_CODE_EXAMPLES
 from ui.components.page_settings import main as display_settings
 from ui.components.page_token_stats import main as display_token_stats
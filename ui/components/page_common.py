@@ -135,7 +135,9 @@ def display_technical_analysis_tab(stock_identity=None, index_name=None):
                 stock_identity, 
                 period=160, 
                 use_cache=use_cache, 
-                force_refresh=force_refresh
+                force_refresh=force_refresh,
+                compute_risk=False,
+                columnar=True
             )
             
             if 'error' in kline_info:
@@ -510,14 +510,16 @@ def display_technical_analysis(stock_identity):
                     period=160, 
                     use_cache=use_cache, 
                     force_refresh=force_refresh, 
-                    include_ai_analysis=True
+                    include_ai_analysis=True,
+                    columnar=True
                 )
         else:
             kline_info = stock_tools.get_stock_kline_data(
                 stock_identity, 
                 period=160, 
                 use_cache=use_cache, 
-                force_refresh=force_refresh
+                force_refresh=force_refresh,
+                columnar=True
             )
         
         if 'error' in kline_info:
@@ -2,6 +2,7 @@
 
 import os
 import sys
+import threading
 from typing import Dict, Any, List
 
 project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -81,11 +82,8 @@ def format_technical_indicators(tech_indicators):
         ('CCI(14)', f"{tech_indicators.get('cci_14', 0):.2f}")
     ]
     
-    for label, value in tech_metrics:
-        if value and str(value) != "0.00":
-            md_content += f"- **{label}**: {value}\n"
-    
-    md_content += "\n"
+    md_content += "".join(f"- **{label}**: {value}\n" for label, value in tech_metrics
+                          if value and str(value) != "0.00") + "\n"
     
     # RSI水平判断
     rsi_14 = tech_indicators.get('rsi_14', 50)
@@ -195,6 +193,29 @@ def format_risk_metrics(risk_metrics, with_header = True):
     return md_content
 
 
+# 基本信息中的财务指标分组：(标题, [(字段名, 单位)])，按顺序输出
+_FINANCIAL_SECTIONS = (
+    ("📊 盈利能力指标", [('净资产收益率(ROE)', '%'), ('总资产报酬率(ROA)', '%'), ('毛利率', '%'),
+                      ('销售净利率', '%'), ('营业利润率', '%')]),
+    ("💰 偿债能力指标", [('资产负债率', '%'), ('流动比率', ''), ('速动比率', ''), ('现金比率', ''), ('权益乘数', '')]),
+    ("🔄 营运能力指标", [('总资产周转率', ''), ('应收账款周转率', ''), ('存货周转率', ''), ('流动资产周转率', '')]),
+    ("📈 成长能力指标", [('营业总收入增长率', '%'), ('归属母公司净利润增长率', '%')]),
+    ("📋 估值指标", [('市盈率', ''), ('市净率', '')]),
+    ("💎 每股指标", [('基本每股收益', '元'), ('每股净资产', '元'), ('每股经营现金流', '元'), ('每股营业收入', '元')]),
+)
+
+
+# 筹码分析指标与技术参考位：(字段名, 显示名称)，按顺序输出
+_CHIP_ANALYSIS_FIELDS = (('profit_status', '获利状态'), ('concentration_status', '集中度状态'), ('risk_level', '风险水平'))
+_CHIP_REFERENCE_LEVELS = (('support_level', '支撑位'), ('resistance_level', '**阻力位**'), ('cost_center', '成本中枢'))
+
+
+def _has_field_value(basic_info: Dict[str, Any], field_name: str) -> bool:
+    """字段存在且值非空"""
+    value = basic_info.get(field_name)
+    return value is not None and bool(str(value).strip())
+
+
 class StockDataFormatter:
     """股票数据格式化器"""
     
@@ -232,81 +253,13 @@ class StockDataFormatter:
             md_content += f"- 流通市值: {format_market_value(basic_info['流通市值'])}{currency_symbol}\n"
         
         # 基本财务比率（直接使用中文字段名）
-        profitability_section = ""
-        profitability_indicators = ['净资产收益率(ROE)', '总资产报酬率(ROA)', '毛利率', '销售净利率', '营业利润率']
-        
-        for field_name in profitability_indicators:
-            if field_name in basic_info and basic_info[field_name] is not None and str(basic_info[field_name]).strip():
-                value = basic_info[field_name]
-                formatted_value = format_numeric_value(value, 2)
-                profitability_section += f"- {field_name}: {formatted_value}%\n"
-        
-        if profitability_section:
-            md_content += "\n### 📊 盈利能力指标\n" + profitability_section
-        
-        solvency_section = ""
-        solvency_indicators = ['资产负债率', '流动比率', '速动比率', '现金比率', '权益乘数']
-        
-        for field_name in solvency_indicators:
-            if field_name in basic_info and basic_info[field_name] is not None and str(basic_info[field_name]).strip():
-                value = basic_info[field_name]
-                if field_name == '资产负债率':
-                    formatted_value = format_numeric_value(value, 2)
-                    solvency_section += f"- {field_name}: {formatted_value}%\n"
-                else:
-                    formatted_value = format_numeric_value(value, 2)
-                    solvency_section += f"- {field_name}: {formatted_value}\n"
-        
-        if solvency_section:
-            md_content += "\n### 💰 偿债能力指标\n" + solvency_section
-        
-        efficiency_section = ""
-        efficiency_indicators = ['总资产周转率', '应收账款周转率', '存货周转率', '流动资产周转率']
-        
-        for field_name in efficiency_indicators:
-            if field_name in basic_info and basic_info[field_name] is not None and str(basic_info[field_name]).strip():
-                value = basic_info[field_name]
-                formatted_value = format_numeric_value(value, 2)
-                efficiency_section += f"- {field_name}: {formatted_value}\n"
-        
-        if efficiency_section:
-            md_content += "\n### 🔄 营运能力指标\n" + efficiency_section
-        
-        growth_section = ""
-        growth_indicators = ['营业总收入增长率', '归属母公司净利润增长率']
-        
-        for field_name in growth_indicators:
-            if field_name in basic_info and basic_info[field_name] is not None and str(basic_info[field_name]).strip():
-                value = basic_info[field_name]
-                formatted_value = format_numeric_value(value, 2)
-                growth_section += f"- {field_name}: {formatted_value}%\n"
-        
-        if growth_section:
-            md_content += "\n### 📈 成长能力指标\n" + growth_section
-        
-        valuation_section = ""
-        if '市盈率' in basic_info and basic_info['市盈率'] is not None and str(basic_info['市盈率']).strip():
-            formatted_pe = format_numeric_value(basic_info['市盈率'], 2)
-            valuation_section += f"- 市盈率: {formatted_pe}\n"
-        if '市净率' in basic_info and basic_info['市净率'] is not None and str(basic_info['市净率']).strip():
-            formatted_pb = format_numeric_value(basic_info['市净率'], 2)
-            valuation_section += f"- 市净率: {formatted_pb}\n"
-        
-        if valuation_section:
-            md_content += "\n### 📋 估值指标\n" + valuation_section
-        
-        # 每股指标
-        per_share_section = ""
-        per_share_indicators = ['基本每股收益', '每股净资产', '每股经营现金流', '每股营业收入']
-        
-        for field_name in per_share_indicators:
-            if field_name in basic_info and basic_info[field_name] is not None and str(basic_info[field_name]).strip():
-                value = basic_info[field_name]
-                formatted_value = format_numeric_value(value, 2)
-                per_share_section += f"- {field_name}: {formatted_value}元\n"
-        
-        if per_share_section:
-            md_content += "\n### 💎 每股指标\n" + per_share_section
+        for title, fields in _FINANCIAL_SECTIONS:
+            section = "".join(
+                f"- {field_name}: {format_numeric_value(basic_info[field_name], 2)}{unit}\n"
+                for field_name, unit in fields if _has_field_value(basic_info, field_name)
+            )
+            if section:
+                md_content += f"\n### {title}\n" + section
         
         # 股息分红信息（仅在 include_dividend=True 时显示）
         if include_dividend:
@@ -390,21 +343,22 @@ class StockDataFormatter:
             return "暂无相关新闻数据"
 
         text_parts = [f"共获取到 {len(news_data)} 条相关新闻:\n"]
+        items = news_data[:max_item] if max_item > 0 else news_data
+
+        if not has_content:
+            # 仅标题链接时每条一行，直接用生成器拼接
+            text_parts.extend(f"- [{news.get('新闻标题', '无标题')}]({news['新闻链接']}) - {news.get('发布时间', '')}\n"
+                              for news in items)
+            return "\n".join(text_parts)
 
-        for i, news in enumerate(news_data):
-            title = news.get('新闻标题', '无标题')
-            if has_content:
-                text_parts.append(f"{i+1}. 新闻标题: {title}")
-                if '发布时间' in news:
-                    text_parts.append(f"   发布时间: {news['发布时间']}")
-                if has_content and '新闻内容' in news and news['新闻内容']:
-                    content = news['新闻内容'][:200] + "..." if len(news['新闻内容']) > 200 else news['新闻内容']
-                    text_parts.append(f"   新闻内容: {content}")
-            else:
-                text_parts.append(f"- [{title}]({news['新闻链接']}) - {news.get('发布时间', '')}")
+        for i, news in enumerate(items):
+            text_parts.append(f"{i+1}. 新闻标题: {news.get('新闻标题', '无标题')}")
+            if '发布时间' in news:
+                text_parts.append(f"   发布时间: {news['发布时间']}")
+            if '新闻内容' in news and news['新闻内容']:
+                content = news['新闻内容'][:200] + "..." if len(news['新闻内容']) > 200 else news['新闻内容']
+                text_parts.append(f"   新闻内容: {content}")
             text_parts.append("")
-            if max_item > 0 and i + 1 >= max_item:
-                break
 
         return "\n".join(text_parts)
         
@@ -436,31 +390,14 @@ class StockDataFormatter:
         # 分析指标
         if 'analysis' in chip_data:
             analysis = chip_data['analysis']
-            md_content += "\n分析指标:\n"
-            if 'profit_status' in analysis:
-                md_content += f"- 获利状态: {analysis['profit_status']}\n"
-            if 'concentration_status' in analysis:
-                md_content += f"- 集中度状态: {analysis['concentration_status']}\n"
-            if 'risk_level' in analysis:
-                md_content += f"- 风险水平: {analysis['risk_level']}\n"
-        
-        # 技术参考位
-        reference_added = False
-        if 'support_level' in chip_data:
-            if not reference_added:
-                md_content += "\n技术参考位:\n"
-                reference_added = True
-            md_content += f"- 支撑位: {format_price(chip_data['support_level'])}\n"
-        if 'resistance_level' in chip_data:
-            if not reference_added:
-                md_content += "\n技术参考位:\n"
-                reference_added = True
-            md_content += f"- **阻力位**: {format_price(chip_data['resistance_level'])}\n"
-        if 'cost_center' in chip_data:
-            if not reference_added:
-                md_content += "\n技术参考位:\n"
-                reference_added = True
-            md_content += f"- 成本中枢: {format_price(chip_data['cost_center'])}\n"
+            md_content += "\n分析指标:\n" + "".join(
+                f"- {label}: {analysis[key]}\n" for key, label in _CHIP_ANALYSIS_FIELDS if key in analysis)
+        
+        # 技术参考位，有任一参考位时才输出标题
+        reference_lines = "".join(f"- {label}: {format_price(chip_data[key])}\n"
+                                  for key, label in _CHIP_REFERENCE_LEVELS if key in chip_data)
+        if reference_lines:
+            md_content += "\n技术参考位:\n" + reference_lines
 
         return md_content
     
@@ -567,11 +504,14 @@ def get_indicator_value(basic_info: Dict[str, Any], indicator_key: str) -> Any:
 
 
 _formatter = None
+_formatter_lock = threading.Lock()
 
 def get_stock_formatter() -> StockDataFormatter:
-    """获取全局股票数据格式化器实例"""
+    """获取全局股票数据格式化器实例（线程安全）"""
     global _formatter
     if _formatter is None:
-        _formatter = StockDataFormatter()
+        with _formatter_lock:
+            if _formatter is None:
+                _formatter = StockDataFormatter()
     return _formatter
 
@@ -3,6 +3,28 @@
 提供统一的数字显示格式化功能
 """
 
+import time
+from bisect import bisect_right
+
+# RSI分级边界及对应描述（左闭右开区间）
+_RSI_BOUNDS = (20, 30, 70, 80)
+_RSI_LABELS = ("超卖", "弱势", "正常", "强势", "超买")
+
+# 最近一次格式化的时间字符串：(整秒时间戳, 字符串)，整体替换元组保证多线程下两者一致
+_now_str_cache = (0, '')
+
+
+def now_str() -> str:
+    """返回当前时间的 '%Y-%m-%d %H:%M:%S' 字符串，同一秒内复用已格式化的结果"""
+    global _now_str_cache
+    second = int(time.time())
+    cached_second, cached_text = _now_str_cache
+    if second == cached_second:
+        return cached_text
+    text = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second))
+    _now_str_cache = (second, text)
+    return text
+
 def format_large_number(number, decimal_places=2):
     """
     格式化大数字，自动添加单位（万、亿等）
@@ -167,16 +189,9 @@ def judge_rsi_level(rsi: float) -> str:
     Returns:
         str: RSI水平描述
     """
-    if rsi >= 80:
-        return "超买"
-    elif rsi >= 70:
-        return "强势"
-    elif rsi >= 30:
-        return "正常"
-    elif rsi >= 20:
-        return "弱势"
-    else:
-        return "超卖"
+    if rsi != rsi:  # NaN与任何边界比较都不成立，与原有判断保持一致归为超卖
+        return _RSI_LABELS[0]
+    return _RSI_LABELS[bisect_right(_RSI_BOUNDS, rsi)]
     
 def get_section_separator(markdown: bool = False) -> list:
     """获取章节分隔符